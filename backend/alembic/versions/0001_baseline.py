@@ -0,0 +1,148 @@
+"""Baseline schema (001_initial.sql through 004_attendance_summaries.sql).
+
+Creates whatever is missing, so it applies cleanly both to an empty database
+and to one previously built by ``create_all`` or the SQL scripts. Legacy JSON
+embeddings in ``users.face_embedding`` are converted to float32 blobs, since
+matching only reads ``face_encoding``.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-17
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.embeddings import EMBEDDING_VERSION, legacy_json_to_blob
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _tables():
+    metadata = sa.MetaData()
+    return [
+        sa.Table(
+            "users", metadata,
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("name", sa.String, nullable=False),
+            sa.Column("email", sa.String, nullable=False, unique=True, index=True),
+            sa.Column("password_hash", sa.String, nullable=False),
+            sa.Column("role", sa.String, nullable=False),
+            sa.Column("group", sa.String, nullable=True),
+            sa.Column("photo_path", sa.String, nullable=True),
+            sa.Column("face_embedding", sa.Text, nullable=True),
+            sa.Column("face_encoding", sa.LargeBinary, nullable=True),
+            sa.Column("embedding_version", sa.String, nullable=True),
+        ),
+        sa.Table(
+            "courses", metadata,
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("name", sa.String, nullable=False),
+            sa.Column("description", sa.Text, nullable=False),
+            sa.Column("teacher_id", sa.Integer, sa.ForeignKey("users.id"), nullable=True),
+        ),
+        sa.Table(
+            "student_courses", metadata,
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("student_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("course_id", sa.Integer, sa.ForeignKey("courses.id"), nullable=False),
+            sa.UniqueConstraint("student_id", "course_id", name="uq_student_course"),
+        ),
+        sa.Table(
+            "sessions", metadata,
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("course_id", sa.Integer, sa.ForeignKey("courses.id"), nullable=False),
+            sa.Column("teacher_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("started_at", sa.DateTime, nullable=False),
+            sa.Column("ended_at", sa.DateTime, nullable=True),
+            sa.Column("status", sa.Enum("open", "closed", "submitted", name="session_status")),
+        ),
+        sa.Table(
+            "attendance", metadata,
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("session_id", sa.Integer, sa.ForeignKey("sessions.id"), nullable=False),
+            sa.Column("student_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+            sa.Column(
+                "status",
+                sa.Enum("present", "absent", "late", "excused", name="attendance_status"),
+                nullable=False,
+            ),
+            sa.Column("timestamp", sa.DateTime, nullable=False),
+        ),
+        sa.Table(
+            "attendance_summaries", metadata,
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("student_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False, index=True),
+            sa.Column("course_id", sa.Integer, sa.ForeignKey("courses.id"), nullable=False),
+            sa.Column("present", sa.Integer, nullable=False, server_default="0"),
+            sa.Column("late", sa.Integer, nullable=False, server_default="0"),
+            sa.Column("absent", sa.Integer, nullable=False, server_default="0"),
+            sa.Column("excused", sa.Integer, nullable=False, server_default="0"),
+            sa.Column("total", sa.Integer, nullable=False, server_default="0"),
+            sa.UniqueConstraint("student_id", "course_id", name="uq_attendance_summary"),
+        ),
+    ]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    existing = set(sa.inspect(bind).get_table_names())
+    for table in _tables():
+        if table.name not in existing:
+            table.create(bind)
+
+    # Databases that predate 003_binary_face_embeddings.sql.
+    user_columns = {column["name"] for column in sa.inspect(bind).get_columns("users")}
+    with op.batch_alter_table("users") as batch:
+        if "face_encoding" not in user_columns:
+            batch.add_column(sa.Column("face_encoding", sa.LargeBinary, nullable=True))
+        if "embedding_version" not in user_columns:
+            batch.add_column(sa.Column("embedding_version", sa.String, nullable=True))
+    _convert_legacy_embeddings(bind)
+
+
+def _convert_legacy_embeddings(bind) -> None:
+    users = sa.table(
+        "users",
+        sa.column("id", sa.Integer),
+        sa.column("face_embedding", sa.Text),
+        sa.column("face_encoding", sa.LargeBinary),
+        sa.column("embedding_version", sa.String),
+    )
+    rows = bind.execute(
+        sa.select(users.c.id, users.c.face_embedding).where(
+            users.c.face_embedding.isnot(None), users.c.face_encoding.is_(None)
+        )
+    ).all()
+    converted = []
+    for row in rows:
+        try:
+            blob = legacy_json_to_blob(row.face_embedding)
+        except ValueError:
+            # Left in place for scripts.backfill_embeddings to report.
+            logger.warning("Skipping unreadable legacy embedding of user %s", row.id)
+            continue
+        if blob is not None:
+            converted.append({"user_id": row.id, "blob": blob})
+    if converted:
+        bind.execute(
+            users.update()
+            .where(users.c.id == sa.bindparam("user_id"))
+            .values(
+                face_encoding=sa.bindparam("blob"),
+                embedding_version=EMBEDDING_VERSION,
+                face_embedding=None,
+            ),
+            converted,
+        )
+
+
+def downgrade() -> None:
+    for table in reversed(_tables()):
+        op.drop_table(table.name)
@@ -0,0 +1,73 @@
+"""Composite indexes for hot queries and one attendance row per (session, student).
+
+Revision ID: 0002_hot_path_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_hot_path_indexes"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_attendance_student_session", "attendance", ["student_id", "session_id"]),
+    ("ix_sessions_course_started", "sessions", ["course_id", "started_at"]),
+    ("ix_sessions_teacher_id", "sessions", ["teacher_id"]),
+    ("ix_student_courses_course_student", "student_courses", ["course_id", "student_id"]),
+)
+
+
+def upgrade() -> None:
+    # Concurrent marking could insert the same student twice; keep the most
+    # recent row so the unique index can be built.
+    op.execute(
+        """
+        DELETE FROM attendance
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM attendance GROUP BY session_id, student_id
+        )
+        """
+    )
+    inspector = sa.inspect(op.get_bind())
+    existing = {
+        index["name"]
+        for table in ("attendance", "sessions", "student_courses")
+        for index in inspector.get_indexes(table)
+    }
+    if "uq_attendance_session_student" not in existing:
+        op.create_index(
+            "uq_attendance_session_student",
+            "attendance",
+            ["session_id", "student_id"],
+            unique=True,
+        )
+    for name, table, columns in INDEXES:
+        if name not in existing:
+            op.create_index(name, table, columns)
+
+    # Counters may include the duplicates removed above.
+    op.execute("DELETE FROM attendance_summaries")
+    op.execute(
+        """
+        INSERT INTO attendance_summaries
+            (student_id, course_id, present, late, absent, excused, total)
+        SELECT a.student_id, s.course_id,
+               SUM(CASE WHEN a.status = 'present' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN a.status = 'late' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN a.status = 'absent' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN a.status = 'excused' THEN 1 ELSE 0 END),
+               COUNT(a.id)
+        FROM attendance a
+        JOIN sessions s ON s.id = a.session_id
+        GROUP BY a.student_id, s.course_id
+        """
+    )
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    op.drop_index("uq_attendance_session_student", table_name="attendance")
@@ -0,0 +1,32 @@
+"""Track when each student's embedding last changed.
+
+Lets the embedding store snapshot be checked against the database with one
+aggregate query instead of reading every embedding.
+
+Revision ID: 0003_embedding_updated_at
+Revises: 0002_hot_path_indexes
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_embedding_updated_at"
+down_revision = "0002_hot_path_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    user_columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("users")}
+    if "embedding_updated_at" not in user_columns:
+        with op.batch_alter_table("users") as batch:
+            batch.add_column(sa.Column("embedding_updated_at", sa.DateTime, nullable=True))
+    op.execute(
+        "UPDATE users SET embedding_updated_at = CURRENT_TIMESTAMP "
+        "WHERE face_encoding IS NOT NULL AND embedding_updated_at IS NULL"
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("embedding_updated_at")
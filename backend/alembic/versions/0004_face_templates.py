@@ -0,0 +1,43 @@
+"""Several enrollment embeddings per student.
+
+``users.face_encoding`` becomes the centroid of the student's templates; each
+existing embedding is copied in as the student's first template.
+
+Revision ID: 0004_face_templates
+Revises: 0003_embedding_updated_at
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_face_templates"
+down_revision = "0003_embedding_updated_at"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("face_templates"):
+        op.create_table(
+            "face_templates",
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("student_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False, index=True),
+            sa.Column("embedding", sa.LargeBinary, nullable=False),
+            sa.Column("embedding_version", sa.String, nullable=False),
+            sa.Column("photo_path", sa.String, nullable=True),
+            sa.Column("created_at", sa.DateTime, nullable=False),
+        )
+    op.execute(
+        """
+        INSERT INTO face_templates (student_id, embedding, embedding_version, photo_path, created_at)
+        SELECT id, face_encoding, embedding_version, photo_path,
+               COALESCE(embedding_updated_at, CURRENT_TIMESTAMP)
+        FROM users
+        WHERE face_encoding IS NOT NULL AND embedding_version IS NOT NULL
+          AND id NOT IN (SELECT student_id FROM face_templates)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("face_templates")
@@ -0,0 +1,32 @@
+"""Persist bulk enrollment jobs so any worker can report their progress.
+
+Revision ID: 0005_bulk_enrollment_jobs
+Revises: 0004_face_templates
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_bulk_enrollment_jobs"
+down_revision = "0004_face_templates"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("bulk_enrollment_jobs"):
+        return
+    op.create_table(
+        "bulk_enrollment_jobs",
+        sa.Column("id", sa.String, primary_key=True),
+        sa.Column("status", sa.String, nullable=False),
+        sa.Column("total", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("processed", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("items", sa.Text, nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False, index=True),
+        sa.Column("finished_at", sa.DateTime, nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("bulk_enrollment_jobs")
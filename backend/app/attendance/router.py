@@ -1,22 +1,63 @@
+import csv
+import io
 import json
-from collections import defaultdict
-from typing import Dict, List, Optional
-
-import face_recognition
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
-from sqlalchemy.orm import Session
-
-from app.auth.dependencies import get_current_user, require_role
-from app.database import get_db
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Form,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.attendance import summary
+from app.auth.dependencies import Principal, authenticate_token, get_current_user, require_role
+from app.config import get_settings
+from app.database import AsyncSessionLocal, SessionLocal, get_async_db
 from app.models import Attendance as AttendanceModel
-from app.models import Course, Session as SessionModel, StudentCourse, User
-from app.schemas.attendance import AttendanceEdit, AttendanceResponse, RetakeRequest
+from app.models import Session as SessionModel
+from app.repositories import attendance as attendance_repo
+from app.repositories import courses as course_repo
+from app.repositories import sessions as session_repo
+from app.repositories import users as user_repo
+from app.schemas.attendance import (
+    AttendanceEdit,
+    AttendanceResponse,
+    IdentifiedFace,
+    IdentifyResponse,
+    RetakeRequest,
+)
+from app.utils.face import analyze_frame, encode_upload, get_profile, run_face_job
+from app.utils.gallery import CourseGallery, assign_faces
+from app.utils.identification import identity_index
+from app.utils.imaging import read_upload
+from app.utils.metrics import FACE_MATCHES, FACES_PER_FRAME, GALLERY_SIZE, stage
+from app.utils.tracking import FaceTracker
 
 router = APIRouter(prefix="/attendance", tags=["attendance"])
+settings = get_settings()
+
+MATCH_TOLERANCE = 0.5
+SHORTLIST_RADIUS = MATCH_TOLERANCE + settings.template_shortlist_margin
+TRACK_IOU_THRESHOLD = 0.3
+EXPORT_BATCH_SIZE = 1000
 
 
-def _get_session(session_id: int, db: Session) -> SessionModel:
-    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
+async def _get_session(session_id: int, db: AsyncSession) -> SessionModel:
+    session = await session_repo.get_session(db, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     return session
@@ -27,7 +68,9 @@ def _ensure_teacher_session(session: SessionModel, teacher_id: int):
         raise HTTPException(status_code=403, detail="Not your session")
 
 
-def _to_response(record: AttendanceModel, student_name: Optional[str]) -> AttendanceResponse:
+def _to_response(
+    record: AttendanceModel, student_name: Optional[str], distance: Optional[float] = None
+) -> AttendanceResponse:
     return AttendanceResponse(
         id=record.id,
         session_id=record.session_id,
@@ -35,206 +78,286 @@ def _to_response(record: AttendanceModel, student_name: Optional[str]) -> Attend
         status=record.status,
         timestamp=record.timestamp,
         student_name=student_name,
+        distance=distance,
     )
 
 
+async def _load_marking_gallery(session_id: int, teacher_id: int, db: AsyncSession) -> CourseGallery:
+    session = await _get_session(session_id, db)
+    if session.status == "submitted":
+        raise HTTPException(status_code=400, detail="Session already submitted")
+    _ensure_teacher_session(session, teacher_id)
+
+    with stage("gallery_load"):
+        gallery = await attendance_repo.load_gallery(db, session.course_id)
+    if not len(gallery):
+        raise HTTPException(status_code=400, detail="No embeddings registered")
+    return gallery
+
+
+async def _record_matches(
+    session_id: int, course_id: int, matched: Dict[int, Tuple[str, float]], db: AsyncSession
+) -> List[AttendanceResponse]:
+    """Mark ``matched`` (student id to name and match distance) present."""
+    with stage("db_write"):
+        records = await attendance_repo.mark_present(db, session_id, course_id, list(matched))
+        responses = [_to_response(record, *matched[record.student_id]) for record in records]
+        await db.commit()
+    return responses
+
+
 @router.post("/mark", response_model=Dict[str, List[AttendanceResponse]])
-def mark_attendance(
+async def mark_attendance(
     session_id: int = Form(...),
     file: UploadFile = File(...),
-    current_user: User = Depends(require_role("teacher")),
-    db: Session = Depends(get_db),
+    profile: Optional[str] = Form(None),
+    current_user: Principal = Depends(require_role("teacher")),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    session = _get_session(session_id, db)
-    if session.status == "submitted":
-        raise HTTPException(status_code=400, detail="Session already submitted")
-    _ensure_teacher_session(session, current_user.id)
+    detection_profile = get_profile(profile, settings.marking_profile)
+    gallery = await _load_marking_gallery(session_id, current_user.id, db)
 
-    course = db.query(Course).filter(Course.id == session.course_id).first()
-    students = (
-        db.query(User)
-        .join(StudentCourse, StudentCourse.student_id == User.id)
-        .filter(StudentCourse.course_id == course.id)
-        .all()
-    )
-    known_embeddings = []
-    student_map = []
-    for student in students:
-        if student.face_embedding:
-            known_embeddings.append(json.loads(student.face_embedding))
-            student_map.append(student)
-
-    if not known_embeddings:
-        raise HTTPException(status_code=400, detail="No embeddings registered")
+    frame_encodings = await encode_upload(await read_upload(file), detection_profile)
+    FACES_PER_FRAME.observe(len(frame_encodings), source="mark")
+    if not frame_encodings:
+        raise HTTPException(status_code=400, detail="No faces detected")
+
+    GALLERY_SIZE.observe(len(gallery))
+    with stage("match"):
+        # Each face marks at most one student and vice versa, so look-alikes
+        # under the tolerance are not all marked from a single face.
+        distances = gallery.distances(frame_encodings, SHORTLIST_RADIUS)
+        matched = {
+            int(gallery.student_ids[idx]): (gallery.student_names[idx], distance)
+            for _, idx, distance in assign_faces(distances, MATCH_TOLERANCE)
+        }
+    FACE_MATCHES.inc(len(matched), source="mark")
+
+    responses = await _record_matches(session_id, gallery.course_id, matched, db)
+    return {"attendance": responses}
+
+
+def _identify(frame_encodings: List[np.ndarray]) -> tuple:
+    with SessionLocal() as sync_db:
+        return identity_index.search(sync_db, np.stack(frame_encodings), k=1)
 
-    file.file.seek(0)
-    image = face_recognition.load_image_file(file.file)
-    frame_encodings = face_recognition.face_encodings(image)
+
+@router.post("/identify", response_model=IdentifyResponse)
+async def identify_faces(
+    file: UploadFile = File(...),
+    profile: Optional[str] = Form(None),
+    _: Principal = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Identify every face in an image among all enrolled students, not one course.
+
+    Faces are listed in detection order; ``student_id`` is null when nobody
+    is within the match tolerance.
+    """
+    detection_profile = get_profile(profile, settings.marking_profile)
+    frame_encodings = await encode_upload(await read_upload(file), detection_profile)
+    FACES_PER_FRAME.observe(len(frame_encodings), source="identify")
     if not frame_encodings:
         raise HTTPException(status_code=400, detail="No faces detected")
 
-    responses: List[AttendanceResponse] = []
-    for frame_encoding in frame_encodings:
-        matches = face_recognition.compare_faces(
-            known_embeddings, frame_encoding, tolerance=0.5
-        )
-        matched_indexes = [idx for idx, matched in enumerate(matches) if matched]
-        for idx in matched_indexes:
-            student = student_map[idx]
-            record = (
-                db.query(AttendanceModel)
-                .filter(
-                    AttendanceModel.session_id == session_id,
-                    AttendanceModel.student_id == student.id,
-                )
-                .first()
+    student_ids, distances = await run_in_threadpool(_identify, frame_encodings)
+    matched = [
+        int(student_id) if distance <= MATCH_TOLERANCE else None
+        for student_id, distance in zip(student_ids[:, 0], distances[:, 0])
+    ]
+    names = await user_repo.get_user_names(db, {student_id for student_id in matched if student_id})
+    FACE_MATCHES.inc(sum(student_id is not None for student_id in matched), source="identify")
+    return {
+        "faces": [
+            IdentifiedFace(
+                student_id=student_id,
+                student_name=names.get(student_id),
+                distance=float(distance) if np.isfinite(distance) else None,
             )
-            if record:
-                record.status = "present"
-            else:
-                record = AttendanceModel(
-                    session_id=session_id,
-                    student_id=student.id,
-                    status="present",
+            for student_id, distance in zip(matched, distances[:, 0])
+        ]
+    }
+
+
+async def _authenticate_teacher(token: str, db: AsyncSession) -> Principal:
+    user = await authenticate_token(token, db)
+    if user.role != "teacher":
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    return user
+
+
+@router.websocket("/stream/{session_id}")
+async def stream_attendance(
+    websocket: WebSocket,
+    session_id: int,
+    token: str = Query(...),
+    profile: Optional[str] = Query(None),
+):
+    """Mark attendance from a live camera.
+
+    The client sends encoded frames (JPEG/PNG) as binary messages. Faces are
+    tracked across frames so only new or still unidentified faces are encoded,
+    and a ``marked`` event is pushed the first time a student is recognized.
+    Once the session is submitted or deleted, an ``error`` event is sent and
+    the socket closed instead of recording further matches.
+
+    A socket stays open for the whole class, so it holds no database session;
+    each gallery load and write opens a short-lived one.
+    """
+    await websocket.accept()
+    try:
+        detection_profile = get_profile(profile, settings.marking_profile)
+        async with AsyncSessionLocal() as db:
+            teacher = await _authenticate_teacher(token, db)
+            gallery = await _load_marking_gallery(session_id, teacher.id, db)
+    except HTTPException as exc:
+        await websocket.send_json({"type": "error", "detail": exc.detail})
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    tracker = FaceTracker(iou_threshold=TRACK_IOU_THRESHOLD)
+    marked: Set[int] = set()
+    await websocket.send_json({"type": "ready", "session_id": session_id, "enrolled": len(gallery)})
+    try:
+        while True:
+            frame = await websocket.receive_bytes()
+            try:
+                locations, encodings = await run_face_job(
+                    analyze_frame,
+                    frame,
+                    detection_profile,
+                    tracker.settled_boxes(),
+                    TRACK_IOU_THRESHOLD,
                 )
-                db.add(record)
-            db.commit()
-            responses.append(_to_response(record, student.name))
-    return {"attendance": responses}
+            except HTTPException as exc:
+                await websocket.send_json({"type": "error", "detail": exc.detail})
+                continue
+
+            tracks = tracker.update(locations)
+            pending = [
+                (track, encoding)
+                for track, encoding in zip(tracks, encodings)
+                if encoding is not None and not track.confirmed
+            ]
+            FACES_PER_FRAME.observe(len(locations), source="stream")
+            newly_marked: Dict[int, Tuple[str, float]] = {}
+            if pending:
+                async with AsyncSessionLocal() as db:
+                    gallery = await attendance_repo.load_gallery(db, gallery.course_id)
+                GALLERY_SIZE.observe(len(gallery))
+                with stage("match"):
+                    distances = gallery.distances(
+                        [encoding for _, encoding in pending], SHORTLIST_RADIUS
+                    )
+                    for track, _ in pending:
+                        track.attempts += 1
+                    for face, idx, distance in assign_faces(distances, MATCH_TOLERANCE):
+                        track = pending[face][0]
+                        track.student_id = int(gallery.student_ids[idx])
+                        if track.student_id not in marked:
+                            newly_marked[track.student_id] = (gallery.student_names[idx], distance)
+
+            if newly_marked:
+                async with AsyncSessionLocal() as db:
+                    session_status = await session_repo.get_status(db, session_id)
+                    if session_status is not None and session_status != "submitted":
+                        responses = await _record_matches(
+                            session_id, gallery.course_id, newly_marked, db
+                        )
+                if session_status is None or session_status == "submitted":
+                    detail = "Session not found" if session_status is None else "Session already submitted"
+                    await websocket.send_json({"type": "error", "detail": detail})
+                    await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                    return
+                marked.update(newly_marked)
+                FACE_MATCHES.inc(len(newly_marked), source="stream")
+                for response in responses:
+                    await websocket.send_json(
+                        {"type": "marked", **jsonable_encoder(response)}
+                    )
+            await websocket.send_json(
+                {
+                    "type": "frame",
+                    "faces": len(locations),
+                    "encoded": len(pending),
+                    "tracks": [
+                        {"track_id": track.track_id, "box": track.box, "student_id": track.student_id}
+                        for track in tracks
+                    ],
+                }
+            )
+    except WebSocketDisconnect:
+        pass
 
 
 @router.post("/retake")
-def retake_attendance(
+async def retake_attendance(
     payload: RetakeRequest,
-    current_user: User = Depends(require_role("teacher")),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role("teacher")),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    session = _get_session(payload.session_id, db)
+    session = await _get_session(payload.session_id, db)
     _ensure_teacher_session(session, current_user.id)
     if session.status == "submitted":
         raise HTTPException(status_code=400, detail="Cannot retake submitted session")
-    db.query(AttendanceModel).filter(AttendanceModel.session_id == payload.session_id).delete()
+    await session_repo.clear_attendance(db, session)
     session.status = "open"
-    db.commit()
+    await db.commit()
     return {"detail": "Attendance cleared for retake"}
 
 
 @router.get("/session/{session_id}", response_model=List[AttendanceResponse])
-def get_session_attendance(
+async def get_session_attendance(
     session_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    session = _get_session(session_id, db)
+    session = await _get_session(session_id, db)
     if current_user.role == "teacher":
         _ensure_teacher_session(session, current_user.id)
     elif current_user.role == "student":
-        enrollment = (
-            db.query(StudentCourse)
-            .filter(
-                StudentCourse.course_id == session.course_id,
-                StudentCourse.student_id == current_user.id,
-            )
-            .first()
-        )
-        if not enrollment:
+        if not await course_repo.is_enrolled(db, session.course_id, current_user.id):
             raise HTTPException(status_code=403, detail="Not enrolled")
-    records = (
-        db.query(AttendanceModel, User.name)
-        .join(User, AttendanceModel.student_id == User.id)
-        .filter(AttendanceModel.session_id == session_id)
-        .all()
-    )
     return [
         _to_response(record, student_name)
-        for record, student_name in records
+        for record, student_name in await attendance_repo.list_for_session(db, session_id)
     ]
 
 
 @router.get("/student/{student_id}")
-def get_student_attendance(
+async def get_student_attendance(
     student_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     if current_user.role == "student" and current_user.id != student_id:
         raise HTTPException(status_code=403, detail="Cannot view other students")
-    student = db.query(User).filter(User.id == student_id, User.role == "student").first()
+    student = await user_repo.get_user(db, student_id, role="student")
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
-    records_with_names = (
-        db.query(AttendanceModel, User.name, Course.name, SessionModel.course_id, SessionModel.started_at)
-        .join(User, AttendanceModel.student_id == User.id)
-        .join(SessionModel, AttendanceModel.session_id == SessionModel.id)
-        .join(Course, SessionModel.course_id == Course.id)
-        .filter(AttendanceModel.student_id == student_id)
-        .order_by(AttendanceModel.timestamp.desc())
-        .all()
-    )
-
-    # Create session names per course
-    course_session_counts = {}
-    history = []
-    for record, student_name, course_name, course_id, session_started_at in records_with_names:
-        if course_id not in course_session_counts:
-            course_session_counts[course_id] = {}
-
-        # Get all sessions for this course ordered by date
-        if course_id not in course_session_counts or 'sessions' not in course_session_counts[course_id]:
-            course_sessions = (
-                db.query(SessionModel)
-                .filter(SessionModel.course_id == course_id)
-                .order_by(SessionModel.started_at.asc())
-                .all()
-            )
-            course_session_counts[course_id] = {
-                'sessions': course_sessions,
-                'session_map': {s.id: i + 1 for i, s in enumerate(course_sessions)}
-            }
-
-        session_number = course_session_counts[course_id]['session_map'].get(record.session_id, 1)
-
-        history.append({
+    history = [
+        {
             "id": record.id,
             "session_id": record.session_id,
             "student_id": record.student_id,
             "status": record.status,
             "timestamp": record.timestamp,
-            "student_name": student_name,
+            "student_name": student.name,
             "course_id": course_id,
             "course_name": course_name,
             "session_name": f"Session {session_number}",
-        })
-    records = [record for record, _, _, _, _ in records_with_names]
-
-    course_totals: Dict[int, Dict[str, int]] = defaultdict(lambda: {"present": 0, "total": 0})
-    for session in db.query(SessionModel).all():
-        enrollment = (
-            db.query(StudentCourse)
-            .filter(
-                StudentCourse.course_id == session.course_id,
-                StudentCourse.student_id == student_id,
-            )
-            .first()
-        )
-        if not enrollment:
-            continue
-        course_totals[session.course_id]["total"] += 1
-        attendance_record = next(
-            (rec for rec in records if rec.session_id == session.id), None
+        }
+        for record, course_id, session_number, course_name in await attendance_repo.student_history(
+            db, student_id
         )
-        if attendance_record and attendance_record.status == "present":
-            course_totals[session.course_id]["present"] += 1
-
+    ]
     percentages = [
         {
             "course_id": course_id,
-            "attendance_percentage": (
-                (stats["present"] / stats["total"]) * 100 if stats["total"] else 0.0
-            ),
+            "attendance_percentage": (present / total) * 100 if total else 0.0,
         }
-        for course_id, stats in course_totals.items()
+        for course_id, total, present in await attendance_repo.course_totals(db, student_id)
     ]
 
     return {
@@ -244,111 +367,119 @@ def get_student_attendance(
 
 
 @router.put("/edit", response_model=AttendanceResponse)
-def edit_attendance(
+async def edit_attendance(
     payload: AttendanceEdit,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    record = db.query(AttendanceModel).filter(AttendanceModel.id == payload.attendance_id).first()
+    record = await attendance_repo.get_record(db, payload.attendance_id)
     if not record:
         raise HTTPException(status_code=404, detail="Attendance not found")
-    session = _get_session(record.session_id, db)
+    session = await _get_session(record.session_id, db)
     if session.status == "submitted":
         raise HTTPException(status_code=400, detail="Cannot edit attendance for a submitted session")
     if current_user.role == "teacher":
         _ensure_teacher_session(session, current_user.id)
     elif current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    record.status = payload.status
-    db.commit()
-    student_name = (
-        db.query(User.name).filter(User.id == record.student_id).scalar()
-    )
+    if payload.status not in summary.STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid attendance status")
+    await attendance_repo.set_status(db, session.course_id, record, payload.status)
+    await db.commit()
+    student_name = await user_repo.get_user_name(db, record.student_id)
     return _to_response(record, student_name)
 
 
+EXPORT_FIELDS = ["id", "session_id", "student_id", "student_name", "course_name", "status", "timestamp"]
+
+
+def _export_row(row) -> dict:
+    item = dict(row._mapping)
+    item["timestamp"] = row.timestamp.isoformat() if row.timestamp else None
+    return item
+
+
+async def _stream_export(query, export_format: str) -> AsyncIterator[str]:
+    batches = attendance_repo.stream_batches(query, EXPORT_BATCH_SIZE)
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        async for batch in batches:
+            for row in batch:
+                writer.writerow(_export_row(row))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        async for batch in batches:
+            yield "".join(json.dumps(_export_row(row)) + "\n" for row in batch)
+
+
 @router.get("/all")
-def get_all_attendance(
-    current_user: User = Depends(require_role("admin")),
-    db: Session = Depends(get_db),
+async def get_all_attendance(
+    response: Response,
+    cursor: Optional[int] = Query(None, description="Only return records with an id above this"),
+    limit: int = Query(1000, ge=1, le=10000),
+    course_id: Optional[int] = None,
+    session_id: Optional[int] = None,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    format: str = Query("json", pattern="^(json|ndjson|csv)$"),
+    current_user: Principal = Depends(require_role("admin")),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Admin endpoint to get all attendance records with course information"""
-    records = (
-        db.query(AttendanceModel, User.name, Course.name)
-        .join(User, AttendanceModel.student_id == User.id)
-        .join(SessionModel, AttendanceModel.session_id == SessionModel.id)
-        .join(Course, SessionModel.course_id == Course.id)
-        .all()
-    )
-    return [
-        {
-            "id": record.id,
-            "session_id": record.session_id,
-            "student_id": record.student_id,
-            "student_name": student_name,
-            "course_name": course_name,
-            "status": record.status,
-            "timestamp": record.timestamp.isoformat() if record.timestamp else None,
-        }
-        for record, student_name, course_name in records
-    ]
+    """Admin endpoint to get all attendance records with course information
+
+    JSON responses are pages of ``limit`` records ordered by id; when more
+    remain, the ``X-Next-Cursor`` header holds the ``cursor`` for the next page.
+    ``ndjson`` and ``csv`` stream every matching record after ``cursor``.
+    """
+    query = attendance_repo.export_query(cursor, course_id, session_id, status, date_from, date_to)
+    if format != "json":
+        media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+        return StreamingResponse(_stream_export(query, format), media_type=media_type)
+
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1].id)
+    return [_export_row(row) for row in rows]
 
 
 @router.post("/manual", response_model=AttendanceResponse)
-def create_manual_attendance(
+async def create_manual_attendance(
     session_id: int = Form(...),
     student_id: int = Form(...),
     status: str = Form(...),
-    current_user: User = Depends(require_role("teacher")),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role("teacher")),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Manually create or update attendance record for review purposes"""
-    session = _get_session(session_id, db)
+    if status not in summary.STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid attendance status")
+    session = await _get_session(session_id, db)
     if session.status == "submitted":
         raise HTTPException(status_code=400, detail="Cannot modify attendance for a submitted session")
     _ensure_teacher_session(session, current_user.id)
 
     # Check if student is enrolled in the course
-    enrollment = (
-        db.query(StudentCourse)
-        .filter(
-            StudentCourse.course_id == session.course_id,
-            StudentCourse.student_id == student_id,
-        )
-        .first()
-    )
-    if not enrollment:
+    if not await course_repo.is_enrolled(db, session.course_id, student_id):
         raise HTTPException(status_code=400, detail="Student not enrolled in this course")
 
-    # Check if attendance record already exists
-    existing_record = (
-        db.query(AttendanceModel)
-        .filter(
-            AttendanceModel.session_id == session_id,
-            AttendanceModel.student_id == student_id,
-        )
-        .first()
-    )
-
-    if existing_record:
-        # Update existing record
-        existing_record.status = status
-        record = existing_record
-    else:
-        # Create new record
-        record = AttendanceModel(
-            session_id=session_id,
-            student_id=student_id,
-            status=status,
-        )
-        db.add(record)
-
-    db.commit()
-    db.refresh(record)
-
-    # Get student name
-    student_name = (
-        db.query(User.name).filter(User.id == student_id).scalar()
+    existing_record = await attendance_repo.get_student_record(db, session_id, student_id)
+    record = await attendance_repo.set_status(
+        db,
+        session.course_id,
+        existing_record,
+        status,
+        session_id=session_id,
+        student_id=student_id,
     )
+    await db.commit()
+    await db.refresh(record)
 
-    return _to_response(record, student_name)
\ No newline at end of file
+    student_name = await user_repo.get_user_name(db, student_id)
+    return _to_response(record, student_name)
@@ -0,0 +1,129 @@
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.database import upsert
+from app.models import Attendance, AttendanceSummary, Session as SessionModel
+
+STATUSES = ("present", "late", "absent", "excused")
+
+# (student_id, previous status or None, new status or None)
+StatusChange = Tuple[int, Optional[str], Optional[str]]
+
+
+def apply_changes(db: Session, course_id: int, changes: Iterable[StatusChange]) -> None:
+    """Adjust summary counters for attendance writes in ``course_id``.
+
+    Every path that creates, updates or deletes ``Attendance`` rows reports
+    the change here in the same transaction; ``rebuild_summaries`` reconciles
+    any drift.
+    """
+    deltas: Dict[int, Counter] = defaultdict(Counter)
+    for student_id, old_status, new_status in changes:
+        if old_status == new_status:
+            continue
+        if old_status is not None:
+            deltas[student_id][old_status] -= 1
+            deltas[student_id]["total"] -= 1
+        if new_status is not None:
+            deltas[student_id][new_status] += 1
+            deltas[student_id]["total"] += 1
+    if not deltas:
+        return
+
+    stmt = upsert(db, AttendanceSummary).values(
+        [
+            {"student_id": student_id, "course_id": course_id, **dict.fromkeys(STATUSES + ("total",), 0)}
+            for student_id in deltas
+        ]
+    )
+    db.execute(stmt.on_conflict_do_nothing(index_elements=["student_id", "course_id"]))
+
+    # Students with identical deltas (e.g. everyone newly marked present)
+    # share one UPDATE.
+    groups: Dict[tuple, list] = defaultdict(list)
+    for student_id, delta in deltas.items():
+        key = tuple(sorted((column, amount) for column, amount in delta.items() if amount))
+        if key:
+            groups[key].append(student_id)
+    for key, student_ids in groups.items():
+        db.execute(
+            update(AttendanceSummary)
+            .where(
+                AttendanceSummary.course_id == course_id,
+                AttendanceSummary.student_id.in_(student_ids),
+            )
+            .values({
+                getattr(AttendanceSummary, column): getattr(AttendanceSummary, column) + amount
+                for column, amount in key
+            })
+            .execution_options(synchronize_session=False)
+        )
+
+
+def record_session_deletion(db: Session, session: SessionModel) -> None:
+    """Subtract a session's records; call before deleting them."""
+    records = db.query(Attendance.student_id, Attendance.status).filter(
+        Attendance.session_id == session.id
+    )
+    apply_changes(db, session.course_id, [(student_id, status, None) for student_id, status in records])
+
+
+def _aggregate(course_ids: Optional[Sequence[int]] = None, student_ids: Optional[Sequence[int]] = None):
+    query = (
+        select(
+            Attendance.student_id,
+            SessionModel.course_id,
+            *(func.count(case((Attendance.status == status, 1))) for status in STATUSES),
+            func.count(Attendance.id),
+        )
+        .join(SessionModel, Attendance.session_id == SessionModel.id)
+        .group_by(Attendance.student_id, SessionModel.course_id)
+    )
+    if course_ids is not None:
+        query = query.where(SessionModel.course_id.in_(course_ids))
+    if student_ids is not None:
+        query = query.where(Attendance.student_id.in_(student_ids))
+    return query
+
+
+def refresh_summaries(
+    db: Session,
+    course_ids: Optional[Sequence[int]] = None,
+    student_ids: Optional[Sequence[int]] = None,
+) -> None:
+    """Recompute summaries in the given scope from raw attendance rows."""
+    stale = delete(AttendanceSummary)
+    if course_ids is not None:
+        stale = stale.where(AttendanceSummary.course_id.in_(course_ids))
+    if student_ids is not None:
+        stale = stale.where(AttendanceSummary.student_id.in_(student_ids))
+    db.execute(stale.execution_options(synchronize_session=False))
+    db.execute(
+        insert(AttendanceSummary).from_select(
+            ["student_id", "course_id", *STATUSES, "total"],
+            _aggregate(course_ids, student_ids),
+        )
+    )
+
+
+def rebuild_summaries(db: Session) -> int:
+    """Rebuild every summary from raw rows and return how many had drifted."""
+    columns = (*STATUSES, "total")
+    expected = {
+        (row[0], row[1]): tuple(row[2:])
+        for row in db.execute(_aggregate())
+    }
+    current = {
+        (row.student_id, row.course_id): tuple(getattr(row, column) for column in columns)
+        for row in db.query(AttendanceSummary)
+    }
+    empty = (0,) * len(columns)
+    drifted = sum(
+        1 for key in expected.keys() | current.keys()
+        if expected.get(key, empty) != current.get(key, empty)
+    )
+    refresh_summaries(db)
+    return drifted
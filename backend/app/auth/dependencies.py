@@ -3,10 +3,11 @@ import logging
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
-from app.models import User
+from app.auth.principal import Principal, principal_cache
+from app.database import get_async_db
+from app.repositories import users as user_repo
 from app.utils.security import decode_token
 
 logger = logging.getLogger(__name__)
@@ -14,7 +15,7 @@ logger = logging.getLogger(__name__)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def authenticate_token(token: str, db: AsyncSession) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -37,15 +38,26 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         logger.warning("JWT decode failed: %s", exc)
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == user_id).first()
+    principal = principal_cache.get(user_id, token)
+    if principal is not None:
+        return principal
+    user = await user_repo.get_user(db, user_id)
     if user is None:
         logger.warning("User %s from token not found", user_id)
         raise credentials_exception
-    return user
+    principal = Principal.from_user(user)
+    principal_cache.put(token, principal)
+    return principal
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    return await authenticate_token(token, db)
 
 
 def require_role(*roles: str):
-    def dependency(current_user: User = Depends(get_current_user)):
+    async def dependency(current_user: Principal = Depends(get_current_user)):
         if current_user.role not in roles:
             raise HTTPException(status_code=403, detail="Insufficient permissions")
         return current_user
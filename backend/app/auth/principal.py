@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from app.config import get_settings
+from app.models import User
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user, detached from any database session."""
+
+    id: int
+    name: str
+    email: str
+    role: str
+    group: Optional[str] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, name=user.name, email=user.email, role=user.role, group=user.group)
+
+
+class PrincipalCache:
+    """Bounded LRU of principals keyed by (user id, token), with a TTL.
+
+    Entries are process-local: other workers see account changes once the TTL
+    expires, so keep it short.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float) -> None:
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[float, Principal]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, token: str) -> Optional[Principal]:
+        key = (user_id, token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return principal
+
+    def put(self, token: str, principal: Principal) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[(principal.id, token)] = (
+                time.monotonic() + self.ttl_seconds,
+                principal,
+            )
+            self._entries.move_to_end((principal.id, token))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(
+    maxsize=settings.principal_cache_size, ttl_seconds=settings.principal_cache_ttl_seconds
+)
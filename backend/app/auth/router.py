@@ -1,22 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
-from app.models import User
+from app.database import get_async_db
+from app.repositories import users as user_repo
 from app.schemas.auth import LoginRequest, LoginResponse, Token
 from app.schemas.auth import UserInfo
-from app.utils.security import create_access_token, verify_password
+from app.utils.security import create_access_token, verify_and_update_password
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/login", response_model=LoginResponse)
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == payload.email).first()
-    if not user or not verify_password(payload.password, user.password_hash):
+async def login(payload: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await user_repo.get_user_by_email(db, payload.email)
+    if not user:
         raise HTTPException(status_code=400, detail="Invalid credentials")
+    verified, new_hash = await verify_and_update_password(payload.password, user.password_hash)
+    if not verified:
+        raise HTTPException(status_code=400, detail="Invalid credentials")
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
 
     token = create_access_token({"sub": user.id, "role": user.role})
     return LoginResponse(user=UserInfo.from_orm(user), token=Token(access_token=token))
-
@@ -1,21 +1,86 @@
 import os
 from functools import lru_cache
+from typing import Dict, Literal, Optional
 
-from pydantic import Field
+from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings
 
 
+class DetectionProfile(BaseModel):
+    model: Literal["hog", "cnn"] = "hog"
+    upsample: int = 1
+    # Detection runs on a copy whose longest side is at most this many pixels.
+    max_dimension: Optional[int] = None
+    num_jitters: int = 1
+
+
+def _default_detection_profiles() -> Dict[str, DetectionProfile]:
+    return {
+        "fast-classroom": DetectionProfile(model="hog", upsample=1, max_dimension=1280),
+        "accurate-enrollment": DetectionProfile(
+            model="hog", upsample=1, max_dimension=2048, num_jitters=5
+        ),
+        "cnn": DetectionProfile(model="cnn", upsample=0, max_dimension=960),
+    }
+
+
 class Settings(BaseSettings):
     app_name: str = Field(default="Face Recognition Attendance API")
     secret_key: str = Field(default=os.environ.get("JWT_SECRET", "super-secret"))
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 60 * 12
+    principal_cache_size: int = 10_000
+    principal_cache_ttl_seconds: int = 60
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = Field(default=max(1, (os.cpu_count() or 2) // 2))
+    # Password hashes allowed to wait for a worker before logins get a 503.
+    password_hash_queue_size: int = 64
     database_url: str = Field(
         default=os.environ.get(
             "DATABASE_URL", "sqlite:///./face_recognition_attendance.db"
         )
     )
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    db_statement_timeout_ms: int = 30_000
     upload_dir: str = Field(default=os.environ.get("UPLOAD_DIR", "backend/uploads"))
+    inference_workers: int = Field(default=max(1, (os.cpu_count() or 2) - 1))
+    inference_queue_size: int = 16
+    detection_profiles: Dict[str, DetectionProfile] = Field(
+        default_factory=_default_detection_profiles
+    )
+    marking_profile: str = "fast-classroom"
+    enrollment_profile: str = "accurate-enrollment"
+    max_upload_bytes: int = 20 * 1024 * 1024
+    # Images are decoded at most this large; bigger sources are scaled down
+    # while decoding, and sources above image_max_source_pixels are rejected.
+    image_max_dimension: int = 2560
+    image_max_pixels: int = 2560 * 1920
+    image_max_source_pixels: int = 100_000_000
+    bulk_enrollment_max_items: int = 5000
+    # Face encodings cached by image digest and profile; an empty path disables it.
+    encoding_cache_path: str = "encoding_cache.db"
+    encoding_cache_max_bytes: int = 64 * 1024 * 1024
+    # Enrollment photos kept per student; matching uses the closest one for
+    # students whose centroid is within the tolerance plus this margin.
+    max_face_templates: int = 5
+    template_shortlist_margin: float = 0.2
+    # Campus-wide identification: inverted lists probed and candidates reranked.
+    identify_nprobe: int = 16
+    identify_rerank: int = 32
+    # Memory-mapped embedding store shared by all workers; an empty path disables it.
+    embedding_store_path: str = "embedding_store.bin"
+    # Without the store, cached course galleries are reloaded after this long
+    # so enrollment changes made by other workers are picked up.
+    gallery_cache_ttl_seconds: float = 10.0
+    # Serve Prometheus metrics on /metrics.
+    metrics_enabled: bool = True
 
     class Config:
         env_file = ".env"
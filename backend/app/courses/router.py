@@ -1,11 +1,13 @@
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.auth.dependencies import get_current_user, require_role
-from app.database import get_db
-from app.models import Attendance, Course, Session as SessionModel, StudentCourse, User
+from app.auth.dependencies import Principal, get_current_user, require_role
+from app.database import get_async_db
+from app.models import Course, StudentCourse
+from app.repositories import courses as course_repo
+from app.repositories import users as user_repo
 from app.schemas.course import (
     CourseAssignment,
     CourseCreate,
@@ -13,232 +15,158 @@ from app.schemas.course import (
     CourseUpdate,
     TeacherAssignment,
 )
+from app.utils.gallery import gallery_cache
 
 router = APIRouter(prefix="/courses", tags=["courses"])
 
 
+async def _get_course(course_id: int, db: AsyncSession) -> Course:
+    course = await course_repo.get_course(db, course_id)
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    return course
+
+
 @router.post("", response_model=CourseResponse)
-def create_course(
+async def create_course(
     payload: CourseCreate,
-    db: Session = Depends(get_db),
-    _: User = Depends(require_role("admin")),
+    db: AsyncSession = Depends(get_async_db),
+    _: Principal = Depends(require_role("admin")),
 ):
-    teacher = None
     if payload.teacher_id is not None:
-        teacher = (
-            db.query(User)
-            .filter(User.id == payload.teacher_id, User.role == "teacher")
-            .first()
-        )
+        teacher = await user_repo.get_user(db, payload.teacher_id, role="teacher")
         if not teacher:
             raise HTTPException(status_code=404, detail="Teacher not found")
     course = Course(**payload.dict())
     db.add(course)
-    db.commit()
-    db.refresh(course)
+    await db.commit()
+    await db.refresh(course)
     return course
 
 
 @router.get("", response_model=List[CourseResponse])
-def list_courses(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+async def list_courses(
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    query = db.query(Course)
     if current_user.role == "teacher":
-        query = query.filter(Course.teacher_id == current_user.id)
-    elif current_user.role == "student":
-        query = (
-            query.join(StudentCourse, Course.id == StudentCourse.course_id)
-            .filter(StudentCourse.student_id == current_user.id)
-        )
-    return query.all()
+        return await course_repo.list_courses(db, teacher_id=current_user.id)
+    if current_user.role == "student":
+        return await course_repo.list_courses(db, student_id=current_user.id)
+    return await course_repo.list_courses(db)
 
 
 @router.get("/{course_id}", response_model=CourseResponse)
-def get_course(
+async def get_course(
     course_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    course = db.query(Course).filter(Course.id == course_id).first()
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
+    course = await _get_course(course_id, db)
     if current_user.role == "teacher" and course.teacher_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not your course")
     if current_user.role == "student":
-        link = (
-            db.query(StudentCourse)
-            .filter(
-                StudentCourse.course_id == course_id,
-                StudentCourse.student_id == current_user.id,
-            )
-            .first()
-        )
-        if not link:
+        if not await course_repo.is_enrolled(db, course_id, current_user.id):
             raise HTTPException(status_code=403, detail="Not enrolled")
     return course
 
 
 @router.put("/{course_id}", response_model=CourseResponse)
-def update_course(
+async def update_course(
     course_id: int,
     payload: CourseUpdate,
-    db: Session = Depends(get_db),
-    _: User = Depends(require_role("admin")),
+    db: AsyncSession = Depends(get_async_db),
+    _: Principal = Depends(require_role("admin")),
 ):
-    course = db.query(Course).filter(Course.id == course_id).first()
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
+    course = await _get_course(course_id, db)
     for key, value in payload.dict(exclude_unset=True).items():
         setattr(course, key, value)
-    db.commit()
-    db.refresh(course)
+    await db.commit()
+    await db.refresh(course)
     return course
 
 
 @router.delete("/{course_id}")
-def delete_course(
+async def delete_course(
     course_id: int,
-    db: Session = Depends(get_db),
-    _: User = Depends(require_role("admin")),
+    db: AsyncSession = Depends(get_async_db),
+    _: Principal = Depends(require_role("admin")),
 ):
-    course = db.query(Course).filter(Course.id == course_id).first()
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
-    
-    # Get all session IDs for this course
-    session_ids = (
-        db.query(SessionModel.id).filter(SessionModel.course_id == course_id).all()
-    )
-    session_id_list = [sid[0] for sid in session_ids]
-    
-    # Delete all attendance records for sessions in this course
-    if session_id_list:
-        (
-            db.query(Attendance)
-            .filter(Attendance.session_id.in_(session_id_list))
-            .delete(synchronize_session=False)
-        )
-    
-    # Delete all sessions for this course
-    (
-        db.query(SessionModel)
-        .filter(SessionModel.course_id == course_id)
-        .delete(synchronize_session=False)
-    )
-    
-    # Delete all student-course relationships
-    (
-        db.query(StudentCourse)
-        .filter(StudentCourse.course_id == course_id)
-        .delete(synchronize_session=False)
-    )
-    
-    # Delete the course
-    db.delete(course)
-    db.commit()
+    course = await _get_course(course_id, db)
+    await course_repo.delete_course(db, course)
+    await db.commit()
+    gallery_cache.invalidate_course(course_id)
     return {"detail": "Course deleted"}
 
 
 @router.post("/assign-student")
-def assign_student(
+async def assign_student(
     payload: CourseAssignment,
-    db: Session = Depends(get_db),
-    _: User = Depends(require_role("admin")),
+    db: AsyncSession = Depends(get_async_db),
+    _: Principal = Depends(require_role("admin")),
 ):
-    student = db.query(User).filter(User.id == payload.student_id, User.role == "student").first()
-    course = db.query(Course).filter(Course.id == payload.course_id).first()
+    student = await user_repo.get_user(db, payload.student_id, role="student")
+    course = await course_repo.get_course(db, payload.course_id)
     if not student or not course:
         raise HTTPException(status_code=404, detail="Invalid student or course")
-    link = (
-        db.query(StudentCourse)
-        .filter(
-            StudentCourse.student_id == payload.student_id,
-            StudentCourse.course_id == payload.course_id,
-        )
-        .first()
-    )
-    if link:
+    if await course_repo.is_enrolled(db, payload.course_id, payload.student_id):
         raise HTTPException(status_code=400, detail="Already assigned")
     db.add(StudentCourse(student_id=payload.student_id, course_id=payload.course_id))
-    db.commit()
+    await db.commit()
+    gallery_cache.invalidate_course(payload.course_id)
     return {"detail": "Student assigned"}
 
 
 @router.post("/remove-student")
-def remove_student(
+async def remove_student(
     payload: CourseAssignment,
-    db: Session = Depends(get_db),
-    _: User = Depends(require_role("admin")),
+    db: AsyncSession = Depends(get_async_db),
+    _: Principal = Depends(require_role("admin")),
 ):
-    student = db.query(User).filter(User.id == payload.student_id, User.role == "student").first()
-    course = db.query(Course).filter(Course.id == payload.course_id).first()
+    student = await user_repo.get_user(db, payload.student_id, role="student")
+    course = await course_repo.get_course(db, payload.course_id)
     if not student or not course:
         raise HTTPException(status_code=404, detail="Invalid student or course")
-    link = (
-        db.query(StudentCourse)
-        .filter(
-            StudentCourse.student_id == payload.student_id,
-            StudentCourse.course_id == payload.course_id,
-        )
-        .first()
-    )
+    link = await course_repo.get_enrollment(db, payload.course_id, payload.student_id)
     if not link:
         raise HTTPException(status_code=400, detail="Student not assigned to course")
-    db.delete(link)
-    db.commit()
+    await db.delete(link)
+    await db.commit()
+    gallery_cache.invalidate_course(payload.course_id)
     return {"detail": "Student removed from course"}
 
 
 @router.post("/assign-teacher")
-def assign_teacher(
+async def assign_teacher(
     payload: TeacherAssignment,
-    db: Session = Depends(get_db),
-    _: User = Depends(require_role("admin")),
+    db: AsyncSession = Depends(get_async_db),
+    _: Principal = Depends(require_role("admin")),
 ):
-    teacher = db.query(User).filter(User.id == payload.teacher_id, User.role == "teacher").first()
-    course = db.query(Course).filter(Course.id == payload.course_id).first()
+    teacher = await user_repo.get_user(db, payload.teacher_id, role="teacher")
+    course = await course_repo.get_course(db, payload.course_id)
     if not teacher or not course:
         raise HTTPException(status_code=404, detail="Invalid teacher or course")
     course.teacher_id = payload.teacher_id
-    db.commit()
+    await db.commit()
     return {"detail": "Teacher assigned"}
 
 
 @router.get("/{course_id}/students")
-def get_course_students(
+async def get_course_students(
     course_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get all students enrolled in a course"""
-    course = db.query(Course).filter(Course.id == course_id).first()
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
+    course = await _get_course(course_id, db)
 
     # Check permissions
     if current_user.role == "teacher" and course.teacher_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not your course")
     elif current_user.role == "student":
-        enrollment = (
-            db.query(StudentCourse)
-            .filter(
-                StudentCourse.course_id == course_id,
-                StudentCourse.student_id == current_user.id,
-            )
-            .first()
-        )
-        if not enrollment:
+        if not await course_repo.is_enrolled(db, course_id, current_user.id):
             raise HTTPException(status_code=403, detail="Not enrolled")
 
-    enrolled_students = (
-        db.query(User)
-        .join(StudentCourse, User.id == StudentCourse.student_id)
-        .filter(StudentCourse.course_id == course_id)
-        .all()
-    )
-
     return [
         {
             "id": student.id,
@@ -246,5 +174,5 @@ def get_course_students(
             "email": student.email,
             "group": student.group,
         }
-        for student in enrolled_students
+        for student in await course_repo.list_students(db, course_id)
     ]
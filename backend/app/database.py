@@ -1,27 +1,199 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Union
 
-from app.config import get_settings
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Connection, Engine, make_url
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.config import Settings, get_settings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
 
 settings = get_settings()
 
-engine = create_engine(
-    settings.database_url, connect_args={"check_same_thread": False}, future=True
-)
+# pg_advisory_lock key shared by every process running migrations.
+MIGRATION_LOCK_KEY = 0x46524153
+
+
+def _sqlite_pragmas(settings: Settings, in_memory: bool):
+    def configure(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            # WAL lets readers proceed while one teacher's request writes.
+            cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    return configure
+
+
+def create_db_engine(settings: Settings) -> Engine:
+    url = make_url(settings.database_url)
+    if url.get_backend_name() == "sqlite":
+        in_memory = url.database in (None, "", ":memory:")
+        pool_args = {} if in_memory else {
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout,
+        }
+        engine = create_engine(
+            url,
+            connect_args={
+                "check_same_thread": False,
+                "timeout": settings.sqlite_busy_timeout_ms / 1000,
+            },
+            future=True,
+            **pool_args,
+        )
+        event.listen(engine, "connect", _sqlite_pragmas(settings, in_memory))
+        return engine
+
+    connect_args = {}
+    if url.get_backend_name() == "postgresql" and settings.db_statement_timeout_ms:
+        connect_args["options"] = f"-c statement_timeout={int(settings.db_statement_timeout_ms)}"
+    return create_engine(
+        url,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=True,
+        connect_args=connect_args,
+        future=True,
+    )
+
+
+# Async drivers used for request handling; DATABASE_URL keeps naming the sync
+# driver, which alembic and the scripts use.
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def create_async_db_engine(settings: Settings) -> AsyncEngine:
+    url = make_url(settings.database_url)
+    backend = url.get_backend_name()
+    if backend in ASYNC_DRIVERS:
+        url = url.set(drivername=ASYNC_DRIVERS[backend])
+    if backend == "sqlite":
+        in_memory = url.database in (None, "", ":memory:")
+        # aiosqlite defaults to NullPool; reuse connections like the sync engine.
+        pool_args = {} if in_memory else {
+            "poolclass": AsyncAdaptedQueuePool,
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout,
+        }
+        engine = create_async_engine(
+            url,
+            connect_args={"timeout": settings.sqlite_busy_timeout_ms / 1000},
+            **pool_args,
+        )
+        event.listen(engine.sync_engine, "connect", _sqlite_pragmas(settings, in_memory))
+        return engine
+
+    connect_args = {}
+    if backend == "postgresql" and settings.db_statement_timeout_ms:
+        connect_args["server_settings"] = {
+            "statement_timeout": str(int(settings.db_statement_timeout_ms))
+        }
+    return create_async_engine(
+        url,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=True,
+        connect_args=connect_args,
+    )
+
+
+def pool_stats(engine: Engine) -> dict:
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__, "status": pool.status()}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            stats[name] = method()
+    return stats
+
+
+def upsert(db: Union[Session, AsyncSession], entity):
+    """An INSERT supporting ``on_conflict_do_update``/``on_conflict_do_nothing``."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(entity)
+    if dialect == "sqlite":
+        return sqlite.insert(entity)
+    raise NotImplementedError(f"Upserts are not supported on {dialect}")
+
+
+engine = create_db_engine(settings)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
 
+async_engine = create_async_db_engine(settings)
+# Attributes stay loaded after commit: lazy refreshes are not allowed in async code.
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+@contextmanager
+def migration_lock(connection: Connection):
+    """Hold a cross-process lock while migrating, so workers starting at once
+    run the chain one after another instead of racing on the same revision.
+
+    PostgreSQL uses a session advisory lock; SQLite an ``flock`` on a file
+    next to the database.
+    """
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        # The lock outlives this transaction; alembic starts its own.
+        connection.commit()
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            connection.commit()
+        return
+    database = connection.engine.url.database
+    if dialect != "sqlite" or fcntl is None or database in (None, "", ":memory:"):
+        yield
+        return
+    with open(f"{database}.migrate.lock", "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def run_migrations(revision: str = "head") -> None:
+    """Bring the schema up to ``revision`` with the alembic migration chain."""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(str(Path(__file__).resolve().parent.parent / "alembic.ini"))
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, revision)
 
 
 if __name__ == "__main__":
-    Base.metadata.create_all(bind=engine)
+    run_migrations()
     print("Database initialized.")
-
@@ -1,16 +1,42 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
 
 from app.auth import router as auth_router
 from app.attendance import router as attendance_router
+from app.config import get_settings
 from app.courses import router as courses_router
-from app.database import Base, engine
+from app.database import SessionLocal, async_engine, pool_stats, run_migrations
 from app.sessions import router as sessions_router
 from app.users import router as admin_router
+from app.utils.gallery import gallery_cache, sync_embedding_store
+from app.utils.inference import inference_engine
+from app.utils.metrics import Gauge, MetricsMiddleware, count_query, registry
+
+settings = get_settings()
+
+
+def _load_embedding_store() -> None:
+    with SessionLocal() as db:
+        sync_embedding_store(db, gallery_cache.store)
+
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    run_migrations()
+    if gallery_cache.store is not None:
+        await run_in_threadpool(_load_embedding_store)
+    inference_engine.start()
+    yield
+    inference_engine.shutdown()
+    await async_engine.dispose()
 
-app = FastAPI(title="Face Recognition Attendance API")
+
+app = FastAPI(title="Face Recognition Attendance API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,8 +44,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_query)
+    registry.register(Gauge(
+        "face_inference_pending",
+        "Face jobs running or queued in the inference pool.",
+        lambda: inference_engine.pending,
+    ))
+    registry.register(Gauge(
+        "db_pool_checked_out",
+        "Database connections currently in use.",
+        lambda: pool_stats(async_engine.sync_engine).get("checkedout", 0),
+    ))
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 app.include_router(auth_router)
 app.include_router(admin_router)
 app.include_router(courses_router)
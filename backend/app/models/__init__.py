@@ -1,4 +1,21 @@
-from .entities import Attendance, Course, Session, StudentCourse, User
-
-__all__ = ["User", "Course", "StudentCourse", "Session", "Attendance"]
+from .entities import (
+    Attendance,
+    AttendanceSummary,
+    BulkEnrollmentJob,
+    Course,
+    FaceTemplate,
+    Session,
+    StudentCourse,
+    User,
+)
 
+__all__ = [
+    "User",
+    "FaceTemplate",
+    "Course",
+    "StudentCourse",
+    "Session",
+    "Attendance",
+    "AttendanceSummary",
+    "BulkEnrollmentJob",
+]
@@ -6,7 +6,9 @@ from sqlalchemy import (
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Integer,
+    LargeBinary,
     String,
     Text,
     UniqueConstraint,
@@ -26,12 +28,30 @@ class User(Base):
     role = Column(String, nullable=False)
     group = Column(String, nullable=True)
     photo_path = Column(String, nullable=True)
+    # Legacy JSON-encoded embedding, superseded by face_encoding.
     face_embedding = Column(Text, nullable=True)
+    # Centroid of the student's face templates.
+    face_encoding = Column(LargeBinary, nullable=True)
+    embedding_version = Column(String, nullable=True)
+    embedding_updated_at = Column(DateTime, nullable=True)
 
     teaching_courses = relationship("Course", back_populates="teacher")
     student_courses = relationship("StudentCourse", back_populates="student")
 
 
+class FaceTemplate(Base):
+    """One enrollment embedding; a student keeps up to ``max_face_templates``."""
+
+    __tablename__ = "face_templates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    embedding = Column(LargeBinary, nullable=False)
+    embedding_version = Column(String, nullable=False)
+    photo_path = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class Course(Base):
     __tablename__ = "courses"
 
@@ -49,6 +69,7 @@ class StudentCourse(Base):
     __tablename__ = "student_courses"
     __table_args__ = (
         UniqueConstraint("student_id", "course_id", name="uq_student_course"),
+        Index("ix_student_courses_course_student", "course_id", "student_id"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -61,6 +82,10 @@ class StudentCourse(Base):
 
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        Index("ix_sessions_course_started", "course_id", "started_at"),
+        Index("ix_sessions_teacher_id", "teacher_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
@@ -77,6 +102,12 @@ class Session(Base):
 
 class Attendance(Base):
     __tablename__ = "attendance"
+    __table_args__ = (
+        # A unique index rather than a constraint so SQLite can add it to
+        # existing tables; it is the conflict target for upserts.
+        Index("uq_attendance_session_student", "session_id", "student_id", unique=True),
+        Index("ix_attendance_student_session", "student_id", "session_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("sessions.id"), nullable=False)
@@ -94,3 +125,35 @@ class Attendance(Base):
     def student_name(self) -> Optional[str]:
         return self.student.name if self.student else None
 
+
+class AttendanceSummary(Base):
+    """Per-(student, course) attendance counters, maintained with every write."""
+
+    __tablename__ = "attendance_summaries"
+    __table_args__ = (
+        UniqueConstraint("student_id", "course_id", name="uq_attendance_summary"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+    present = Column(Integer, nullable=False, default=0)
+    late = Column(Integer, nullable=False, default=0)
+    absent = Column(Integer, nullable=False, default=0)
+    excused = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+
+
+class BulkEnrollmentJob(Base):
+    """Progress and per-photo report of a bulk enrollment, readable by every worker."""
+
+    __tablename__ = "bulk_enrollment_jobs"
+
+    id = Column(String, primary_key=True)
+    status = Column(String, nullable=False)
+    total = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    # JSON list of {name, identifier, student_id, status, detail}.
+    items = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -0,0 +1 @@
+"""Async data access for the routers, one module per aggregate."""
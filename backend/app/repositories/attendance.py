@@ -0,0 +1,193 @@
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.attendance import summary
+from app.database import AsyncSessionLocal, upsert
+from app.models import Attendance, AttendanceSummary, Course, Session as SessionModel, StudentCourse, User
+from app.utils.gallery import CourseGallery, gallery_cache
+
+
+async def get_record(db: AsyncSession, attendance_id: int) -> Optional[Attendance]:
+    return await db.get(Attendance, attendance_id)
+
+
+async def get_student_record(db: AsyncSession, session_id: int, student_id: int) -> Optional[Attendance]:
+    return await db.scalar(
+        select(Attendance).where(
+            Attendance.session_id == session_id,
+            Attendance.student_id == student_id,
+        )
+    )
+
+
+async def load_gallery(db: AsyncSession, course_id: int) -> CourseGallery:
+    return await db.run_sync(lambda sync_db: gallery_cache.get(course_id, sync_db))
+
+
+async def mark_present(
+    db: AsyncSession, session_id: int, course_id: int, student_ids: Sequence[int]
+) -> List[Attendance]:
+    """Upsert "present" rows for ``student_ids`` without committing.
+
+    One INSERT ... ON CONFLICT covers new and existing rows, so concurrent
+    marks of the same student cannot create duplicates.
+    """
+    if not student_ids:
+        return []
+    stmt = upsert(db, Attendance).values(
+        [
+            {"session_id": session_id, "student_id": student_id, "status": "present"}
+            for student_id in student_ids
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Attendance.session_id, Attendance.student_id],
+        set_={"status": stmt.excluded.status},
+    ).returning(Attendance)
+    records = {
+        record.student_id: record
+        for record in await db.scalars(stmt, execution_options={"populate_existing": True})
+    }
+    # The upsert does not report previous statuses, so recount these students.
+    await db.run_sync(
+        summary.refresh_summaries, course_ids=[course_id], student_ids=list(student_ids)
+    )
+    return [records[student_id] for student_id in student_ids]
+
+
+async def set_status(
+    db: AsyncSession,
+    course_id: int,
+    record: Optional[Attendance],
+    status: str,
+    session_id: Optional[int] = None,
+    student_id: Optional[int] = None,
+) -> Attendance:
+    """Update ``record`` (or create one for the student) and its summary counts."""
+    if record is None:
+        record = Attendance(session_id=session_id, student_id=student_id, status=status)
+        db.add(record)
+        previous = None
+    else:
+        previous = record.status
+        record.status = status
+    await db.run_sync(summary.apply_changes, course_id, [(record.student_id, previous, status)])
+    return record
+
+
+async def list_for_session(db: AsyncSession, session_id: int) -> List[Tuple[Attendance, str]]:
+    result = await db.execute(
+        select(Attendance, User.name)
+        .join(User, Attendance.student_id == User.id)
+        .where(Attendance.session_id == session_id)
+    )
+    return result.all()
+
+
+async def student_history(db: AsyncSession, student_id: int) -> list:
+    """(record, course_id, session_number, course_name) rows, newest first."""
+    session_numbers = select(
+        SessionModel.id.label("session_id"),
+        SessionModel.course_id.label("course_id"),
+        func.row_number()
+        .over(
+            partition_by=SessionModel.course_id,
+            order_by=(SessionModel.started_at.asc(), SessionModel.id.asc()),
+        )
+        .label("session_number"),
+    ).subquery()
+    result = await db.execute(
+        select(
+            Attendance,
+            session_numbers.c.course_id,
+            session_numbers.c.session_number,
+            Course.name,
+        )
+        .join(session_numbers, Attendance.session_id == session_numbers.c.session_id)
+        .join(Course, session_numbers.c.course_id == Course.id)
+        .where(Attendance.student_id == student_id)
+        .order_by(Attendance.timestamp.desc())
+    )
+    return result.all()
+
+
+async def course_totals(db: AsyncSession, student_id: int) -> list:
+    """(course_id, sessions held, sessions present) per enrolled course.
+
+    Every session of an enrolled course counts, whether or not it has a record.
+    """
+    enrolled_courses = select(StudentCourse.course_id).where(StudentCourse.student_id == student_id)
+    course_sessions = (
+        select(
+            SessionModel.course_id,
+            func.count(SessionModel.id).label("total"),
+            func.min(SessionModel.id).label("first_session_id"),
+        )
+        .where(SessionModel.course_id.in_(enrolled_courses))
+        .group_by(SessionModel.course_id)
+        .subquery()
+    )
+    result = await db.execute(
+        select(
+            course_sessions.c.course_id,
+            course_sessions.c.total,
+            func.coalesce(AttendanceSummary.present, 0),
+        )
+        .outerjoin(
+            AttendanceSummary,
+            (AttendanceSummary.course_id == course_sessions.c.course_id)
+            & (AttendanceSummary.student_id == student_id),
+        )
+        .order_by(course_sessions.c.first_session_id)
+    )
+    return result.all()
+
+
+def export_query(
+    cursor: Optional[int],
+    course_id: Optional[int],
+    session_id: Optional[int],
+    status: Optional[str],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+):
+    query = (
+        select(
+            Attendance.id,
+            Attendance.session_id,
+            Attendance.student_id,
+            User.name.label("student_name"),
+            Course.name.label("course_name"),
+            Attendance.status,
+            Attendance.timestamp,
+        )
+        .join(User, Attendance.student_id == User.id)
+        .join(SessionModel, Attendance.session_id == SessionModel.id)
+        .join(Course, SessionModel.course_id == Course.id)
+        .order_by(Attendance.id)
+    )
+    if cursor is not None:
+        query = query.where(Attendance.id > cursor)
+    if course_id is not None:
+        query = query.where(SessionModel.course_id == course_id)
+    if session_id is not None:
+        query = query.where(Attendance.session_id == session_id)
+    if status is not None:
+        query = query.where(Attendance.status == status)
+    if date_from is not None:
+        query = query.where(Attendance.timestamp >= date_from)
+    if date_to is not None:
+        query = query.where(Attendance.timestamp < date_to)
+    return query
+
+
+async def stream_batches(query, batch_size: int) -> AsyncIterator[list]:
+    # The request's session is closed before a streamed body is sent, so the
+    # export owns its own session and reads from a server-side cursor.
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        async for batch in result.partitions():
+            yield batch
@@ -0,0 +1,65 @@
+from typing import List, Optional
+
+from sqlalchemy import delete, exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Attendance, AttendanceSummary, Course, Session as SessionModel, StudentCourse, User
+
+
+async def get_course(db: AsyncSession, course_id: int) -> Optional[Course]:
+    return await db.get(Course, course_id)
+
+
+async def list_courses(
+    db: AsyncSession, teacher_id: Optional[int] = None, student_id: Optional[int] = None
+) -> List[Course]:
+    query = select(Course)
+    if teacher_id is not None:
+        query = query.where(Course.teacher_id == teacher_id)
+    if student_id is not None:
+        query = query.join(StudentCourse, Course.id == StudentCourse.course_id).where(
+            StudentCourse.student_id == student_id
+        )
+    return list(await db.scalars(query))
+
+
+async def get_enrollment(db: AsyncSession, course_id: int, student_id: int) -> Optional[StudentCourse]:
+    return await db.scalar(
+        select(StudentCourse).where(
+            StudentCourse.course_id == course_id,
+            StudentCourse.student_id == student_id,
+        )
+    )
+
+
+async def is_enrolled(db: AsyncSession, course_id: int, student_id: int) -> bool:
+    return bool(
+        await db.scalar(
+            select(
+                exists().where(
+                    StudentCourse.course_id == course_id,
+                    StudentCourse.student_id == student_id,
+                )
+            )
+        )
+    )
+
+
+async def list_students(db: AsyncSession, course_id: int) -> List[User]:
+    return list(
+        await db.scalars(
+            select(User)
+            .join(StudentCourse, User.id == StudentCourse.student_id)
+            .where(StudentCourse.course_id == course_id)
+        )
+    )
+
+
+async def delete_course(db: AsyncSession, course: Course) -> None:
+    """Delete a course with its sessions, attendance, summaries and enrollments."""
+    course_sessions = select(SessionModel.id).where(SessionModel.course_id == course.id)
+    await db.execute(delete(Attendance).where(Attendance.session_id.in_(course_sessions)))
+    await db.execute(delete(AttendanceSummary).where(AttendanceSummary.course_id == course.id))
+    await db.execute(delete(SessionModel).where(SessionModel.course_id == course.id))
+    await db.execute(delete(StudentCourse).where(StudentCourse.course_id == course.id))
+    await db.delete(course)
@@ -0,0 +1,32 @@
+from typing import Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import upsert
+from app.models import BulkEnrollmentJob
+
+
+async def get_job(db: AsyncSession, job_id: str) -> Optional[BulkEnrollmentJob]:
+    return await db.get(BulkEnrollmentJob, job_id)
+
+
+async def save_job(db: AsyncSession, values: dict) -> None:
+    """Insert the job or overwrite its progress columns."""
+    stmt = upsert(db, BulkEnrollmentJob).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[BulkEnrollmentJob.id],
+        set_={column: stmt.excluded[column] for column in values if column != "id"},
+    )
+    await db.execute(stmt)
+
+
+async def prune_jobs(db: AsyncSession, keep: int) -> None:
+    """Delete all but the ``keep`` most recently created jobs."""
+    newest = (
+        select(BulkEnrollmentJob.id)
+        .order_by(BulkEnrollmentJob.created_at.desc())
+        .limit(keep)
+        .scalar_subquery()
+    )
+    await db.execute(delete(BulkEnrollmentJob).where(BulkEnrollmentJob.id.not_in(newest)))
@@ -0,0 +1,62 @@
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import delete, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.attendance import summary
+from app.database import upsert
+from app.models import Attendance, Session as SessionModel, StudentCourse
+
+
+async def get_session(db: AsyncSession, session_id: int) -> Optional[SessionModel]:
+    return await db.get(SessionModel, session_id)
+
+
+async def get_status(db: AsyncSession, session_id: int) -> Optional[str]:
+    """Current status read from the database, bypassing the identity map."""
+    return await db.scalar(select(SessionModel.status).where(SessionModel.id == session_id))
+
+
+async def list_for_course(db: AsyncSession, course_id: int) -> List[SessionModel]:
+    return list(
+        await db.scalars(
+            select(SessionModel)
+            .where(SessionModel.course_id == course_id)
+            .order_by(SessionModel.started_at.desc())
+        )
+    )
+
+
+async def mark_absentees(db: AsyncSession, session: SessionModel) -> None:
+    """Mark every enrolled student without a record absent.
+
+    Rows marked concurrently win the conflict and are left alone.
+    """
+    enrolled = select(
+        literal(session.id), StudentCourse.student_id, literal("absent"), literal(datetime.utcnow())
+    ).where(StudentCourse.course_id == session.course_id)
+    absent_ids = (
+        await db.scalars(
+            upsert(db, Attendance)
+            .from_select(["session_id", "student_id", "status", "timestamp"], enrolled)
+            .on_conflict_do_nothing(index_elements=["session_id", "student_id"])
+            .returning(Attendance.student_id)
+        )
+    ).all()
+    await db.run_sync(
+        summary.apply_changes,
+        session.course_id,
+        [(student_id, None, "absent") for student_id in absent_ids],
+    )
+
+
+async def clear_attendance(db: AsyncSession, session: SessionModel) -> None:
+    """Delete a session's attendance records and their summary counts."""
+    await db.run_sync(summary.record_session_deletion, session)
+    await db.execute(delete(Attendance).where(Attendance.session_id == session.id))
+
+
+async def delete_session(db: AsyncSession, session: SessionModel) -> None:
+    await clear_attendance(db, session)
+    await db.delete(session)
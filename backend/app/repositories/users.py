@@ -0,0 +1,129 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import (
+    Attendance,
+    AttendanceSummary,
+    Course,
+    FaceTemplate,
+    Session as SessionModel,
+    StudentCourse,
+    User,
+)
+from app.utils.embeddings import EMBEDDING_VERSION, decode_embeddings, encode_embedding
+from app.utils.gallery import embedding_fingerprint_query, fingerprint
+
+
+async def get_user(db: AsyncSession, user_id: int, role: Optional[str] = None) -> Optional[User]:
+    query = select(User).where(User.id == user_id)
+    if role is not None:
+        query = query.where(User.role == role)
+    return await db.scalar(query)
+
+
+async def get_user_by_email(
+    db: AsyncSession, email: str, exclude_id: Optional[int] = None
+) -> Optional[User]:
+    query = select(User).where(User.email == email)
+    if exclude_id is not None:
+        query = query.where(User.id != exclude_id)
+    return await db.scalar(query)
+
+
+async def list_users(db: AsyncSession) -> List[User]:
+    return list(await db.scalars(select(User)))
+
+
+async def get_user_name(db: AsyncSession, user_id: int) -> Optional[str]:
+    return await db.scalar(select(User.name).where(User.id == user_id))
+
+
+async def get_user_names(db: AsyncSession, user_ids: Iterable[int]) -> Dict[int, str]:
+    result = await db.execute(select(User.id, User.name).where(User.id.in_(list(user_ids))))
+    return dict(result.all())
+
+
+async def find_students(db: AsyncSession, ids: Iterable[int], emails: Iterable[str]) -> list:
+    """(id, email) rows of students matching any of ``ids`` or ``emails``."""
+    result = await db.execute(
+        select(User.id, User.email)
+        .where(User.role == "student")
+        .where(or_(User.id.in_(list(ids)), func.lower(User.email).in_(list(emails))))
+    )
+    return result.all()
+
+
+async def save_embeddings(db: AsyncSession, rows: List[dict]) -> None:
+    """Bulk UPDATE of users by primary key; each row holds ``id`` plus columns."""
+    await db.execute(update(User), rows)
+
+
+async def add_face_templates(db: AsyncSession, templates: List[dict], keep: int) -> Dict[int, bytes]:
+    """Insert templates and return each affected student's new centroid.
+
+    ``templates`` rows hold ``student_id``, ``embedding`` and ``photo_path``.
+    Only the ``keep`` newest current-version templates of a student survive.
+    """
+    if not templates:
+        return {}
+    await db.execute(
+        insert(FaceTemplate),
+        [{**template, "embedding_version": EMBEDDING_VERSION} for template in templates],
+    )
+    student_ids = {template["student_id"] for template in templates}
+    rows = await db.execute(
+        select(FaceTemplate.id, FaceTemplate.student_id, FaceTemplate.embedding, FaceTemplate.embedding_version)
+        .where(FaceTemplate.student_id.in_(student_ids))
+        .order_by(FaceTemplate.student_id, FaceTemplate.id.desc())
+    )
+    kept: Dict[int, List[bytes]] = {}
+    stale: List[int] = []
+    for row in rows:
+        blobs = kept.setdefault(row.student_id, [])
+        if row.embedding_version == EMBEDDING_VERSION and len(blobs) < keep:
+            blobs.append(row.embedding)
+        else:
+            stale.append(row.id)
+    if stale:
+        await db.execute(delete(FaceTemplate).where(FaceTemplate.id.in_(stale)))
+    return {
+        student_id: encode_embedding(decode_embeddings(blobs).mean(axis=0, dtype=np.float64))
+        for student_id, blobs in kept.items()
+    }
+
+
+async def delete_face_templates(db: AsyncSession, student_id: int) -> None:
+    await db.execute(delete(FaceTemplate).where(FaceTemplate.student_id == student_id))
+
+
+async def embedding_fingerprint(db: AsyncSession) -> int:
+    return fingerprint((await db.execute(embedding_fingerprint_query())).one())
+
+
+async def delete_student_records(db: AsyncSession, student_id: int) -> None:
+    await db.execute(delete(Attendance).where(Attendance.student_id == student_id))
+    await db.execute(delete(AttendanceSummary).where(AttendanceSummary.student_id == student_id))
+    await db.execute(delete(StudentCourse).where(StudentCourse.student_id == student_id))
+    await db.execute(delete(FaceTemplate).where(FaceTemplate.student_id == student_id))
+
+
+async def delete_teacher_records(db: AsyncSession, teacher_id: int) -> List[int]:
+    """Drop the teacher's sessions and attendance and unassign their courses.
+
+    Returns the ids of courses that lost sessions, whose summaries need a refresh.
+    """
+    affected_course_ids = list(
+        await db.scalars(
+            select(SessionModel.course_id).where(SessionModel.teacher_id == teacher_id).distinct()
+        )
+    )
+    teacher_sessions = select(SessionModel.id).where(SessionModel.teacher_id == teacher_id)
+    await db.execute(delete(Attendance).where(Attendance.session_id.in_(teacher_sessions)))
+    await db.execute(delete(SessionModel).where(SessionModel.teacher_id == teacher_id))
+    await db.execute(
+        update(Course).where(Course.teacher_id == teacher_id).values(teacher_id=None)
+    )
+    return affected_course_ids
@@ -23,6 +23,8 @@ class AttendanceResponse(AttendanceBase):
     id: int
     timestamp: datetime
     student_name: Optional[str] = None
+    # Match distance when the record was created by face recognition.
+    distance: Optional[float] = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -39,3 +41,13 @@ class FaceMarkRequest(BaseModel):
 class RetakeRequest(BaseModel):
     session_id: int
 
+
+class IdentifiedFace(BaseModel):
+    student_id: Optional[int] = None
+    student_name: Optional[str] = None
+    distance: Optional[float] = None
+
+
+class IdentifyResponse(BaseModel):
+    faces: List[IdentifiedFace]
+
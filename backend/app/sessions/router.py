@@ -2,18 +2,20 @@ from datetime import datetime
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.auth.dependencies import get_current_user, require_role
-from app.database import get_db
-from app.models import Attendance, Course, Session as SessionModel, StudentCourse, User
+from app.auth.dependencies import Principal, get_current_user, require_role
+from app.database import get_async_db
+from app.models import Course, Session as SessionModel
+from app.repositories import courses as course_repo
+from app.repositories import sessions as session_repo
 from app.schemas.session import SessionCreate, SessionResponse
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
 
-def _ensure_teacher_course(teacher: User, course_id: int, db: Session):
-    course = db.query(Course).filter(Course.id == course_id).first()
+async def _ensure_teacher_course(teacher: Principal, course_id: int, db: AsyncSession) -> Course:
+    course = await course_repo.get_course(db, course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     if teacher.role != "teacher":
@@ -23,8 +25,8 @@ def _ensure_teacher_course(teacher: User, course_id: int, db: Session):
     return course
 
 
-def _get_session(session_id: int, db: Session):
-    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
+async def _get_session(session_id: int, db: AsyncSession) -> SessionModel:
+    session = await session_repo.get_session(db, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     return session
@@ -36,12 +38,12 @@ def _ensure_teacher_session(session: SessionModel, teacher_id: int):
 
 
 @router.post("/start", response_model=SessionResponse)
-def start_session(
+async def start_session(
     payload: SessionCreate,
-    current_user: User = Depends(require_role("teacher")),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role("teacher")),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    _ensure_teacher_course(current_user, payload.course_id, db)
+    await _ensure_teacher_course(current_user, payload.course_id, db)
     session = SessionModel(
         course_id=payload.course_id,
         teacher_id=current_user.id,
@@ -49,148 +51,86 @@ def start_session(
         started_at=datetime.utcnow(),
     )
     db.add(session)
-    db.commit()
-    db.refresh(session)
+    await db.commit()
+    await db.refresh(session)
     return session
 
 
 @router.post("/end", response_model=SessionResponse)
-def end_session(
+async def end_session(
     session_id: int,
-    current_user: User = Depends(require_role("teacher")),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role("teacher")),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    if session.teacher_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not your session")
+    session = await _get_session(session_id, db)
+    _ensure_teacher_session(session, current_user.id)
     if session.status == "submitted":
         raise HTTPException(status_code=400, detail="Cannot end a submitted session")
     session.status = "closed"
     session.ended_at = datetime.utcnow()
-    db.commit()
-    db.refresh(session)
+    await db.commit()
+    await db.refresh(session)
     return session
 
 
 @router.post("/submit", response_model=SessionResponse)
-def submit_session(
+async def submit_session(
     session_id: int,
-    current_user: User = Depends(require_role("teacher")),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role("teacher")),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    if session.teacher_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not your session")
-    
-    # Get all enrolled students for this course
-    enrolled_students = (
-        db.query(StudentCourse)
-        .filter(StudentCourse.course_id == session.course_id)
-        .all()
-    )
-    enrolled_student_ids = {sc.student_id for sc in enrolled_students}
-    
-    # Get all existing attendance records for this session
-    existing_attendance = (
-        db.query(Attendance)
-        .filter(Attendance.session_id == session_id)
-        .all()
-    )
-    existing_student_ids = {att.student_id for att in existing_attendance}
-    
-    # Create absent records for students who don't have attendance records
-    missing_student_ids = enrolled_student_ids - existing_student_ids
-    for student_id in missing_student_ids:
-        absent_record = Attendance(
-            session_id=session_id,
-            student_id=student_id,
-            status="absent",
-        )
-        db.add(absent_record)
-    
+    session = await _get_session(session_id, db)
+    _ensure_teacher_session(session, current_user.id)
+    await session_repo.mark_absentees(db, session)
     session.status = "submitted"
     session.ended_at = session.ended_at or datetime.utcnow()
-    db.commit()
-    db.refresh(session)
+    await db.commit()
+    await db.refresh(session)
     return session
 
 
 @router.delete("/{session_id}")
-def delete_session(
+async def delete_session(
     session_id: int,
-    current_user: User = Depends(require_role("teacher")),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role("teacher")),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    if session.teacher_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not your session")
-    (
-        db.query(Attendance)
-        .filter(Attendance.session_id == session_id)
-        .delete(synchronize_session=False)
-    )
-    db.delete(session)
-    db.commit()
+    session = await _get_session(session_id, db)
+    _ensure_teacher_session(session, current_user.id)
+    await session_repo.delete_session(db, session)
+    await db.commit()
     return {"detail": "Session deleted"}
 
 
 @router.get("/{session_id}", response_model=SessionResponse)
-def get_session(
+async def get_session(
     session_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get a single session by ID"""
-    session = _get_session(session_id, db)
+    session = await _get_session(session_id, db)
     if current_user.role == "teacher":
         _ensure_teacher_session(session, current_user.id)
     elif current_user.role == "student":
-        enrollment = (
-            db.query(StudentCourse)
-            .filter(
-                StudentCourse.course_id == session.course_id,
-                StudentCourse.student_id == current_user.id,
-            )
-            .first()
-        )
-        if not enrollment:
+        if not await course_repo.is_enrolled(db, session.course_id, current_user.id):
             raise HTTPException(status_code=403, detail="Not enrolled in course")
 
     return SessionResponse.from_orm(session)
 
 
 @router.get("/course/{course_id}", response_model=List[SessionResponse])
-def list_sessions_for_course(
+async def list_sessions_for_course(
     course_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = await course_repo.get_course(db, course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     if current_user.role == "teacher" and course.teacher_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not your course")
     if current_user.role == "student":
-        enrollment = next(
-            (
-                sc
-                for sc in course.students
-                if sc.student_id == current_user.id and sc.course_id == course_id
-            ),
-            None,
-        )
-        if not enrollment:
+        if not await course_repo.is_enrolled(db, course_id, current_user.id):
             raise HTTPException(status_code=403, detail="Not enrolled")
-    return (
-        db.query(SessionModel)
-        .filter(SessionModel.course_id == course_id)
-        .order_by(SessionModel.started_at.desc())
-        .all()
-    )
-
+    return await session_repo.list_for_course(db, course_id)
@@ -0,0 +1,290 @@
+import asyncio
+import json
+import logging
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from app.config import DetectionProfile, get_settings
+from app.database import AsyncSessionLocal
+from app.repositories import enrollment_jobs as job_repo
+from app.repositories import users as user_repo
+from app.utils.embeddings import EMBEDDING_VERSION, encode_embedding
+from app.utils.face import encode_faces, run_face_job
+from app.utils.gallery import gallery_cache
+from app.utils.inference import inference_engine
+from app.utils.storage import photo_store
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+MAX_TRACKED_JOBS = 50
+# Progress is written to the database at most this often while a job runs.
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+
+@dataclass
+class EnrollmentItem:
+    name: str
+    identifier: str
+    student_id: Optional[int] = None
+    status: str = "pending"
+    detail: Optional[str] = None
+
+
+@dataclass
+class EnrollmentJob:
+    id: str
+    items: List[EnrollmentItem]
+    status: str = "running"
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    processed: int = 0
+    saved_at: float = 0.0
+
+    @classmethod
+    def from_row(cls, row) -> "EnrollmentJob":
+        return cls(
+            id=row.id,
+            items=[EnrollmentItem(**item) for item in json.loads(row.items)],
+            status=row.status,
+            created_at=row.created_at,
+            finished_at=row.finished_at,
+            processed=row.processed,
+        )
+
+    def to_row(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "total": len(self.items),
+            "processed": self.processed,
+            "items": json.dumps([asdict(item) for item in self.items]),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+    def summary(self) -> dict:
+        counts: Dict[str, int] = {}
+        for item in self.items:
+            counts[item.status] = counts.get(item.status, 0) + 1
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": len(self.items),
+            "processed": self.processed,
+            "counts": counts,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "items": [asdict(item) for item in self.items],
+        }
+
+
+_tasks = set()
+
+
+async def get_job(job_id: str) -> EnrollmentJob:
+    """Load a job from the database, whichever worker is running it."""
+    async with AsyncSessionLocal() as db:
+        row = await job_repo.get_job(db, job_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Enrollment job not found")
+    return EnrollmentJob.from_row(row)
+
+
+async def _save_job(job: EnrollmentJob, force: bool = True) -> None:
+    now = time.monotonic()
+    if not force and now - job.saved_at < PROGRESS_INTERVAL_SECONDS:
+        return
+    job.saved_at = now
+    async with AsyncSessionLocal() as db:
+        await job_repo.save_job(db, job.to_row())
+        await db.commit()
+
+
+def _stage_uploads(files: List[UploadFile], staging: Path) -> Tuple[Dict[str, Path], List[str]]:
+    """Copy uploads (images or zip archives) to ``staging``, keyed by file name.
+
+    Also returns the names of later files whose name was already staged, which
+    would otherwise silently replace the first one.
+    """
+    staged: Dict[str, Path] = {}
+    duplicates: List[str] = []
+    for upload in files:
+        name = Path(upload.filename or "").name
+        if name.lower().endswith(".zip"):
+            with zipfile.ZipFile(upload.file) as archive:
+                for info in archive.infolist():
+                    entry = Path(info.filename).name
+                    if info.is_dir() or Path(entry).suffix.lower() not in IMAGE_SUFFIXES:
+                        continue
+                    if info.file_size > settings.max_upload_bytes:
+                        raise HTTPException(status_code=413, detail=f"{entry} is too large")
+                    if entry in staged:
+                        duplicates.append(entry)
+                        continue
+                    target = staging / f"{len(staged)}{Path(entry).suffix.lower()}"
+                    with archive.open(info) as source, open(target, "wb") as dest:
+                        shutil.copyfileobj(source, dest)
+                    staged[entry] = target
+        elif name in staged:
+            duplicates.append(name)
+        else:
+            target = staging / f"{len(staged)}{Path(name).suffix.lower()}"
+            with open(target, "wb") as dest:
+                shutil.copyfileobj(upload.file, dest)
+            staged[name] = target
+        if len(staged) > settings.bulk_enrollment_max_items:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {settings.bulk_enrollment_max_items} photos per batch",
+            )
+    if not staged:
+        raise HTTPException(status_code=400, detail="No images found in upload")
+    return staged, duplicates
+
+
+async def _resolve_students(items: List[EnrollmentItem]) -> None:
+    """Map each item's file stem (student id or email) to a student in one query."""
+    ids = {int(item.identifier) for item in items if item.identifier.isdigit()}
+    emails = {item.identifier.lower() for item in items if not item.identifier.isdigit()}
+    async with AsyncSessionLocal() as db:
+        rows = await user_repo.find_students(db, ids, emails)
+    by_id = {row.id: row.id for row in rows}
+    by_email = {row.email.lower(): row.id for row in rows}
+    seen = set()
+    for item in items:
+        if item.status != "pending":
+            continue
+        if item.identifier.isdigit():
+            item.student_id = by_id.get(int(item.identifier))
+        else:
+            item.student_id = by_email.get(item.identifier.lower())
+        if item.student_id is None:
+            item.status = "unknown_student"
+        elif item.student_id in seen:
+            item.status = "duplicate"
+            item.detail = "Student appears more than once in the batch"
+        else:
+            seen.add(item.student_id)
+
+
+async def _save_embeddings(rows: List[dict]) -> None:
+    """Add each row's embedding as a template and store the resulting centroids."""
+    async with AsyncSessionLocal() as db:
+        centroids = await user_repo.add_face_templates(
+            db,
+            [
+                {"student_id": row["id"], "embedding": row["face_encoding"], "photo_path": row["photo_path"]}
+                for row in rows
+            ],
+            settings.max_face_templates,
+        )
+        for row in rows:
+            row["face_encoding"] = centroids[row["id"]]
+        await user_repo.save_embeddings(db, rows)
+        await db.commit()
+        fingerprint = await user_repo.embedding_fingerprint(db) if gallery_cache.store else 0
+    gallery_cache.update_embeddings({row["id"]: row["face_encoding"] for row in rows}, fingerprint)
+
+
+async def _run_job(
+    job: EnrollmentJob, staged: Dict[str, Path], staging: Path, profile: DetectionProfile
+) -> None:
+    try:
+        await _resolve_students(job.items)
+        job.processed = sum(item.status != "pending" for item in job.items)
+        await _save_job(job)
+        encoded: Dict[int, dict] = {}
+        slots = asyncio.Semaphore(inference_engine.workers)
+
+        async def process(item: EnrollmentItem) -> None:
+            async with slots:
+                image_bytes = staged[item.name].read_bytes()
+                try:
+                    _, encodings = await run_face_job(encode_faces, image_bytes, profile, wait=True)
+                except HTTPException as exc:
+                    item.status, item.detail = "invalid_image", exc.detail
+                    return
+                finally:
+                    job.processed += 1
+                    await _save_job(job, force=False)
+            if not encodings:
+                item.status = "no_face"
+            elif len(encodings) > 1:
+                item.status = "multiple_faces"
+                item.detail = f"{len(encodings)} faces detected"
+            else:
+                photo_path = await run_in_threadpool(
+                    photo_store.put_bytes, image_bytes, staged[item.name].suffix
+                )
+                encoded[item.student_id] = {
+                    "id": item.student_id,
+                    "photo_path": str(photo_path),
+                    "face_encoding": encode_embedding(encodings[0]),
+                    "embedding_version": EMBEDDING_VERSION,
+                    "embedding_updated_at": datetime.utcnow(),
+                    "face_embedding": None,
+                }
+                item.status = "enrolled"
+
+        await asyncio.gather(*(process(item) for item in job.items if item.status == "pending"))
+        if encoded:
+            await _save_embeddings(list(encoded.values()))
+        job.status = "completed"
+    except Exception as exc:
+        logger.exception("Bulk enrollment job %s failed", job.id)
+        job.status = "failed"
+        for item in job.items:
+            if item.status == "enrolled":
+                item.status, item.detail = "failed", str(exc)
+    finally:
+        job.finished_at = datetime.utcnow()
+        shutil.rmtree(staging, ignore_errors=True)
+        try:
+            await _save_job(job)
+        except Exception:
+            logger.exception("Could not save bulk enrollment job %s", job.id)
+
+
+async def start_job(files: List[UploadFile], profile: DetectionProfile) -> EnrollmentJob:
+    staging = Path(tempfile.mkdtemp(prefix="enroll-"))
+    try:
+        staged, duplicates = await run_in_threadpool(_stage_uploads, files, staging)
+    except (HTTPException, zipfile.BadZipFile) as exc:
+        shutil.rmtree(staging, ignore_errors=True)
+        if isinstance(exc, zipfile.BadZipFile):
+            raise HTTPException(status_code=400, detail="Invalid zip archive")
+        raise
+
+    job = EnrollmentJob(
+        id=uuid.uuid4().hex,
+        items=[EnrollmentItem(name=name, identifier=Path(name).stem) for name in staged]
+        + [
+            EnrollmentItem(
+                name=name,
+                identifier=Path(name).stem,
+                status="duplicate",
+                detail="File name appears more than once in the upload",
+            )
+            for name in duplicates
+        ],
+    )
+    async with AsyncSessionLocal() as db:
+        await job_repo.save_job(db, job.to_row())
+        await job_repo.prune_jobs(db, MAX_TRACKED_JOBS)
+        await db.commit()
+
+    task = asyncio.get_running_loop().create_task(_run_job(job, staged, staging, profile))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job
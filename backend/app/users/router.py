@@ -1,77 +1,86 @@
-import json
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
-from sqlalchemy.orm import Session
-
-from app.auth.dependencies import require_role
-from app.database import get_db
-from app.models import (
-    Attendance,
-    Course,
-    Session as SessionModel,
-    StudentCourse,
-    User,
-)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.attendance import summary
+from app.auth.dependencies import Principal, require_role
+from app.auth.principal import principal_cache
+from app.config import get_settings
+from app.database import async_engine, get_async_db, pool_stats
+from app.models import User
+from app.repositories import users as user_repo
 from app.schemas.user import (
     PasswordResetRequest,
     UserCreate,
     UserResponse,
     UserUpdate,
 )
-from app.utils.face import extract_face_embedding
-from app.utils.security import get_password_hash
+from app.utils.embeddings import EMBEDDING_VERSION
+from app.users import enrollment
+from app.utils.face import extract_face_embedding, get_profile
+from app.utils.gallery import gallery_cache
+from app.utils.security import hash_password
 
 router = APIRouter(prefix="/admin", tags=["admin"])
+settings = get_settings()
+
+
+async def _get_user(user_id: int, db: AsyncSession) -> User:
+    user = await user_repo.get_user(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
+async def _embedding_fingerprint(db: AsyncSession) -> int:
+    if gallery_cache.store is None:
+        return 0
+    return await user_repo.embedding_fingerprint(db)
 
 
 @router.post("/users", response_model=UserResponse)
-def create_user(
+async def create_user(
     payload: UserCreate,
-    db: Session = Depends(get_db),
-    _: User = Depends(require_role("admin")),
+    db: AsyncSession = Depends(get_async_db),
+    _: Principal = Depends(require_role("admin")),
 ):
-    if db.query(User).filter(User.email == payload.email).first():
+    if await user_repo.get_user_by_email(db, payload.email):
         raise HTTPException(status_code=400, detail="Email already exists")
     user = User(
         name=payload.name,
         email=payload.email,
         role=payload.role,
         group=payload.group,
-        password_hash=get_password_hash(payload.password),
+        password_hash=await hash_password(payload.password),
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
 @router.get("/users", response_model=List[UserResponse])
-def list_users(
-    db: Session = Depends(get_db),
-    _: User = Depends(require_role("admin")),
+async def list_users(
+    db: AsyncSession = Depends(get_async_db),
+    _: Principal = Depends(require_role("admin")),
 ):
-    return db.query(User).all()
+    return await user_repo.list_users(db)
 
 
 @router.put("/users/{user_id}", response_model=UserResponse)
-def update_user(
+async def update_user(
     user_id: int,
     payload: UserUpdate,
-    db: Session = Depends(get_db),
-    _: User = Depends(require_role("admin")),
+    db: AsyncSession = Depends(get_async_db),
+    _: Principal = Depends(require_role("admin")),
 ):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = await _get_user(user_id, db)
     if payload.name:
         user.name = payload.name
     if payload.email:
-        if (
-            db.query(User)
-            .filter(User.email == payload.email, User.id != user_id)
-            .first()
-        ):
+        if await user_repo.get_user_by_email(db, payload.email, exclude_id=user_id):
             raise HTTPException(status_code=400, detail="Email already in use")
         user.email = payload.email
     if payload.group is not None:
@@ -79,87 +88,112 @@ def update_user(
     if payload.role:
         user.role = payload.role
     if payload.password:
-        user.password_hash = get_password_hash(payload.password)
-    db.commit()
-    db.refresh(user)
+        user.password_hash = await hash_password(payload.password)
+    await db.commit()
+    principal_cache.invalidate(user_id)
+    gallery_cache.invalidate_student(user_id)
+    await db.refresh(user)
     return user
 
 
 @router.delete("/users/{user_id}")
-def delete_user(
+async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    _: User = Depends(require_role("admin")),
+    db: AsyncSession = Depends(get_async_db),
+    _: Principal = Depends(require_role("admin")),
 ):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = await _get_user(user_id, db)
     if user.role == "student":
-        (
-            db.query(Attendance)
-            .filter(Attendance.student_id == user_id)
-            .delete(synchronize_session=False)
-        )
-        (
-            db.query(StudentCourse)
-            .filter(StudentCourse.student_id == user_id)
-            .delete(synchronize_session=False)
-        )
+        await user_repo.delete_student_records(db, user_id)
     elif user.role == "teacher":
-        session_ids_subq = (
-            db.query(SessionModel.id).filter(SessionModel.teacher_id == user_id)
-        ).subquery()
-        if session_ids_subq is not None:
-            (
-                db.query(Attendance)
-                .filter(Attendance.session_id.in_(session_ids_subq))
-                .delete(synchronize_session=False)
-            )
-        (
-            db.query(SessionModel)
-            .filter(SessionModel.teacher_id == user_id)
-            .delete(synchronize_session=False)
-        )
-        (
-            db.query(Course)
-            .filter(Course.teacher_id == user_id)
-            .update({Course.teacher_id: None}, synchronize_session=False)
-        )
-
-    db.delete(user)
-    db.commit()
+        affected_course_ids = await user_repo.delete_teacher_records(db, user_id)
+        if affected_course_ids:
+            await db.run_sync(summary.refresh_summaries, course_ids=affected_course_ids)
+
+    await db.delete(user)
+    await db.commit()
+    principal_cache.invalidate(user_id)
+    gallery_cache.forget_student(user_id, await _embedding_fingerprint(db))
     return {"detail": "User deleted"}
 
 
 @router.post("/users/photo", response_model=UserResponse)
-def upload_photo(
+async def upload_photo(
     student_id: int = Form(...),
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    _: User = Depends(require_role("admin")),
+    profile: Optional[str] = Form(None),
+    replace: bool = Form(False),
+    db: AsyncSession = Depends(get_async_db),
+    _: Principal = Depends(require_role("admin")),
 ):
-    student = db.query(User).filter(User.id == student_id, User.role == "student").first()
+    """Add an enrollment photo as a new face template.
+
+    A student keeps their ``max_face_templates`` newest photos, so shots in
+    different lighting can be added over time; ``replace`` drops the old ones.
+    """
+    student = await user_repo.get_user(db, student_id, role="student")
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
-
-    photo_path, embedding = extract_face_embedding(file)
+    photo_path, embedding = await extract_face_embedding(file, profile)
+    if replace:
+        await user_repo.delete_face_templates(db, student.id)
+    centroids = await user_repo.add_face_templates(
+        db,
+        [{"student_id": student.id, "embedding": embedding, "photo_path": photo_path}],
+        settings.max_face_templates,
+    )
     student.photo_path = photo_path
-    student.face_embedding = embedding
-    db.commit()
-    db.refresh(student)
+    student.face_encoding = centroids[student.id]
+    student.embedding_version = EMBEDDING_VERSION
+    student.embedding_updated_at = datetime.utcnow()
+    student.face_embedding = None
+    await db.commit()
+    gallery_cache.update_embeddings(
+        {student.id: student.face_encoding}, await _embedding_fingerprint(db)
+    )
+    await db.refresh(student)
     return student
 
 
+@router.post("/users/photos/bulk", status_code=202)
+async def bulk_upload_photos(
+    files: List[UploadFile] = File(...),
+    profile: Optional[str] = Form(None),
+    _: Principal = Depends(require_role("admin")),
+):
+    """Enroll many students at once from images or zip archives.
+
+    Each image is named after the student's id or email (``42.jpg``,
+    ``jane@uni.edu.png``). Encoding runs in the background; poll the returned
+    job for progress and the per-photo report.
+    """
+    detection_profile = get_profile(profile, settings.enrollment_profile)
+    job = await enrollment.start_job(files, detection_profile)
+    return job.summary()
+
+
+@router.get("/users/photos/bulk/{job_id}")
+async def get_bulk_upload(
+    job_id: str,
+    _: Principal = Depends(require_role("admin")),
+):
+    return (await enrollment.get_job(job_id)).summary()
+
+
+@router.get("/db/pool")
+async def get_pool_stats(_: Principal = Depends(require_role("admin"))):
+    return pool_stats(async_engine.sync_engine)
+
+
 @router.post("/reset-password")
-def reset_password(
+async def reset_password(
     payload: PasswordResetRequest,
-    db: Session = Depends(get_db),
-    _: User = Depends(require_role("admin")),
+    db: AsyncSession = Depends(get_async_db),
+    _: Principal = Depends(require_role("admin")),
 ):
-    user = db.query(User).filter(User.id == payload.user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    user.password_hash = get_password_hash(payload.new_password)
-    db.commit()
+    user = await _get_user(payload.user_id, db)
+    user.password_hash = await hash_password(payload.new_password)
+    await db.commit()
+    principal_cache.invalidate(payload.user_id)
     return {"detail": "Password reset"}
 
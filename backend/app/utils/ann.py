@@ -0,0 +1,263 @@
+"""Approximate nearest-neighbour search over all enrolled embeddings.
+
+An IVF-PQ index in plain NumPy: a coarse k-means quantizer splits the vectors
+into ``nlist`` inverted lists, and each vector's residual to its list centroid
+is compressed with product quantization (``m`` sub-vectors, 256 centroids
+each). A query scans the ``nprobe`` nearest lists with precomputed distance
+tables, then reranks the best candidates by exact distance.
+"""
+import math
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from app.utils.embeddings import EMBEDDING_DIM, pairwise_distances
+
+# Below this many vectors an exact scan is as fast as probing lists.
+MIN_TRAIN_SIZE = 2048
+# Training points per coarse centroid, and for the PQ codebooks in total.
+POINTS_PER_LIST = 32
+PQ_TRAIN_SAMPLE = 10_240
+
+
+def nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the closest centroid for each vector."""
+    # ||v||^2 is the same for every centroid, so it doesn't affect the argmin.
+    norms = np.einsum("ij,ij->i", centroids, centroids)
+    return np.concatenate([
+        (norms[None, :] - 2.0 * vectors[start:start + 8192] @ centroids.T).argmin(axis=1)
+        for start in range(0, len(vectors), 8192)
+    ]) if len(vectors) else np.empty(0, dtype=np.int64)
+
+
+def kmeans(
+    vectors: np.ndarray, k: int, rng: np.random.Generator, iterations: int = 12
+) -> np.ndarray:
+    """Lloyd's algorithm from a random start; empty clusters are reseeded."""
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = nearest(vectors, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        filled = counts > 0
+        # Per-cluster sums over the vectors grouped by assignment.
+        order = np.argsort(assignment, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        centroids[filled] = np.add.reduceat(vectors[order], starts) / counts[filled, None]
+        empty = np.flatnonzero(~filled)
+        if empty.size:
+            centroids[empty] = vectors[rng.choice(len(vectors), size=empty.size, replace=False)]
+    return centroids
+
+
+class IVFPQIndex:
+    """Incrementally updatable IVF-PQ index keyed by student id.
+
+    Full vectors are kept alongside the codes for the exact rerank, so
+    ``search`` returns true Euclidean distances. Until ``train`` has seen
+    ``MIN_TRAIN_SIZE`` vectors, searches are exact.
+    """
+
+    def __init__(self, m: int = 16, nprobe: int = 16, rerank: int = 32, seed: int = 0) -> None:
+        if EMBEDDING_DIM % m:
+            raise ValueError(f"m must divide {EMBEDDING_DIM}")
+        self.m = m
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.rng = np.random.default_rng(seed)
+        self.coarse: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None  # (m, ksub, dsub)
+        self.trained_size = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        self.codes = np.empty((0, m), dtype=np.uint8)
+        self.lists = np.empty(0, dtype=np.int32)
+        self.alive = np.empty(0, dtype=bool)
+        self.size = 0
+        self._rows: Dict[int, int] = {}
+        self._order: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.coarse is not None
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Fit the coarse quantizer and PQ codebooks, then re-encode every stored vector."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) < MIN_TRAIN_SIZE:
+            self.coarse = self.codebooks = None
+            self.trained_size = 0
+            return
+        self.trained_size = len(vectors)
+        nlist = int(min(4096, max(16, 2 * math.sqrt(len(vectors)))))
+        self.coarse = kmeans(self._sample(vectors, nlist * POINTS_PER_LIST), nlist, self.rng)
+        vectors = self._sample(vectors, PQ_TRAIN_SAMPLE)
+        residuals = vectors - self.coarse[nearest(vectors, self.coarse)]
+        dsub = EMBEDDING_DIM // self.m
+        ksub = min(256, len(vectors))
+        self.codebooks = np.stack([
+            kmeans(np.ascontiguousarray(residuals[:, j * dsub:(j + 1) * dsub]), ksub, self.rng, iterations=8)
+            for j in range(self.m)
+        ])
+        if self.size:
+            self.lists[: self.size], self.codes[: self.size] = self._encode(self.vectors[: self.size])
+        self._order = None
+
+    def _sample(self, vectors: np.ndarray, size: int) -> np.ndarray:
+        if len(vectors) <= size:
+            return vectors
+        return vectors[self.rng.choice(len(vectors), size=size, replace=False)]
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        lists = np.zeros(len(vectors), dtype=np.int32)
+        codes = np.zeros((len(vectors), self.m), dtype=np.uint8)
+        if self.coarse is None or not len(vectors):
+            return lists, codes
+        for start in range(0, len(vectors), 8192):
+            chunk = vectors[start:start + 8192]
+            assigned = nearest(chunk, self.coarse)
+            residuals = chunk - self.coarse[assigned]
+            dsub = EMBEDDING_DIM // self.m
+            for j in range(self.m):
+                sub = np.ascontiguousarray(residuals[:, j * dsub:(j + 1) * dsub])
+                codes[start:start + len(chunk), j] = nearest(sub, self.codebooks[j])
+            lists[start:start + len(chunk)] = assigned
+        return lists, codes
+
+    def _reserve(self, count: int) -> None:
+        capacity = len(self.ids)
+        if count <= capacity:
+            return
+        capacity = max(count, capacity * 2, 1024)
+        for name in ("ids", "vectors", "codes", "lists", "alive"):
+            old = getattr(self, name)
+            grown = np.zeros((capacity, *old.shape[1:]), dtype=old.dtype)
+            grown[: self.size] = old[: self.size]
+            setattr(self, name, grown)
+
+    def add(self, student_ids: Iterable[int], vectors: np.ndarray) -> None:
+        """Insert or replace the vectors of ``student_ids``."""
+        student_ids = np.asarray(list(student_ids), dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        if not len(student_ids):
+            return
+        for student_id in student_ids.tolist():
+            self.remove(student_id)
+        self._reserve(self.size + len(student_ids))
+        rows = slice(self.size, self.size + len(student_ids))
+        self.ids[rows] = student_ids
+        self.vectors[rows] = vectors
+        self.lists[rows], self.codes[rows] = self._encode(vectors)
+        self.alive[rows] = True
+        for offset, student_id in enumerate(student_ids.tolist()):
+            self._rows[student_id] = self.size + offset
+        self.size += len(student_ids)
+        self._order = None
+
+    def remove(self, student_id: int) -> None:
+        row = self._rows.pop(student_id, None)
+        if row is not None:
+            self.alive[row] = False
+
+    def sync(self, student_ids: np.ndarray, vectors: np.ndarray) -> int:
+        """Make the index hold exactly ``vectors``; returns how many rows changed.
+
+        Only new, replaced and removed students are touched, so this is cheap
+        after a few enrollments and never retrains.
+        """
+        student_ids = np.asarray(student_ids, dtype=np.int64)
+        wanted = set(student_ids.tolist())
+        removed = [student_id for student_id in self._rows if student_id not in wanted]
+        for student_id in removed:
+            self.remove(student_id)
+        rows = np.fromiter(
+            (self._rows.get(student_id, -1) for student_id in student_ids.tolist()),
+            dtype=np.int64, count=len(student_ids),
+        )
+        changed = rows < 0
+        known = np.flatnonzero(~changed)
+        changed[known] = np.any(self.vectors[rows[known]] != vectors[known], axis=1)
+        self.add(student_ids[changed], vectors[changed])
+        if self.size > 2 * max(len(self), 1024):
+            self.compact()
+        return len(removed) + int(changed.sum())
+
+    def compact(self) -> None:
+        """Drop removed rows, which otherwise stay in the lists as tombstones."""
+        keep = np.flatnonzero(self.alive[: self.size])
+        for name in ("ids", "vectors", "codes", "lists", "alive"):
+            setattr(self, name, getattr(self, name)[keep].copy())
+        self.size = len(keep)
+        self._rows = {student_id: row for row, student_id in enumerate(self.ids.tolist())}
+        self._order = None
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._order is None:
+            self._order = np.argsort(self.lists[: self.size], kind="stable")
+            self._offsets = np.searchsorted(
+                self.lists[: self.size][self._order], np.arange(len(self.coarse) + 1)
+            )
+        return self._order, self._offsets
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Rows in the ``nprobe`` closest lists with the best PQ distance estimates."""
+        order, offsets = self._inverted_lists()
+        nprobe = min(nprobe, len(self.coarse))
+        probed = np.argpartition(((self.coarse - query) ** 2).sum(axis=1), nprobe - 1)[:nprobe]
+        lengths = offsets[probed + 1] - offsets[probed]
+        rows = np.concatenate([order[offsets[idx]:offsets[idx + 1]] for idx in probed])
+        # Distance from the query's residual in each probed list to every
+        # codeword, per sub-vector: shape (nprobe, m, ksub).
+        dsub = EMBEDDING_DIM // self.m
+        residuals = (query[None, :] - self.coarse[probed]).reshape(nprobe, self.m, 1, dsub)
+        tables = ((self.codebooks[None] - residuals) ** 2).sum(axis=3)
+        probe_of_row = np.repeat(np.arange(nprobe), lengths)
+        estimates = tables[probe_of_row[:, None], np.arange(self.m)[None, :], self.codes[rows]].sum(axis=1)
+        alive = self.alive[rows]
+        rows, estimates = rows[alive], estimates[alive]
+        if not len(rows):
+            return rows
+        keep = min(len(rows), self.rerank)
+        return rows[np.argpartition(estimates, keep - 1)[:keep]]
+
+    def search(
+        self, queries: np.ndarray, k: int = 1, nprobe: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return ``(student_ids, distances)`` of shape (queries, k), nearest first.
+
+        Missing neighbours (fewer than ``k`` candidates) are -1 / inf.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        if not len(self):
+            return ids, distances
+        if not self.is_trained:
+            rows = np.flatnonzero(self.alive[: self.size])
+            all_distances = pairwise_distances(queries, self.vectors[rows])
+        for index, query in enumerate(queries):
+            if self.is_trained:
+                rows = self._candidates(query, nprobe or self.nprobe)
+                if not len(rows):
+                    continue
+                row_distances = pairwise_distances(query, self.vectors[rows])[0]
+            else:
+                row_distances = all_distances[index]
+            best = np.argsort(row_distances)[:k]
+            ids[index, : len(best)] = self.ids[rows[best]]
+            distances[index, : len(best)] = row_distances[best]
+        return ids, distances
+
+
+def recall_at_k(index: IVFPQIndex, queries: np.ndarray, k: int = 1, nprobe: Optional[int] = None) -> float:
+    """Share of the exact ``k`` nearest neighbours that the index also returns."""
+    queries = np.asarray(queries, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+    rows = np.flatnonzero(index.alive[: index.size])
+    exact = pairwise_distances(queries, index.vectors[rows])
+    expected = index.ids[rows][np.argsort(exact, axis=1)[:, :k]]
+    found, _ = index.search(queries, k, nprobe)
+    hits = sum(len(set(want.tolist()) & set(got.tolist())) for want, got in zip(expected, found))
+    return hits / float(expected.size)
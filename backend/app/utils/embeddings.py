@@ -0,0 +1,47 @@
+import json
+from typing import Optional, Sequence
+
+import numpy as np
+
+EMBEDDING_DIM = 128
+EMBEDDING_DTYPE = np.dtype("<f4")
+EMBEDDING_VERSION = "dlib-resnet-v1"
+EMBEDDING_NBYTES = EMBEDDING_DIM * EMBEDDING_DTYPE.itemsize
+
+
+def encode_embedding(vector) -> bytes:
+    array = np.asarray(vector, dtype=EMBEDDING_DTYPE).reshape(-1)
+    if array.shape[0] != EMBEDDING_DIM:
+        raise ValueError(f"Expected a {EMBEDDING_DIM}-d embedding, got {array.shape[0]}")
+    return array.tobytes()
+
+
+def decode_embedding(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPE, count=EMBEDDING_DIM)
+
+
+def decode_embeddings(blobs: Sequence[bytes]) -> np.ndarray:
+    """Stack encoded embeddings into a contiguous (n, 128) float32 matrix."""
+    if not blobs:
+        return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+    matrix = np.frombuffer(b"".join(blobs), dtype=EMBEDDING_DTYPE)
+    return matrix.reshape(len(blobs), EMBEDDING_DIM)
+
+
+def legacy_json_to_blob(text: Optional[str]) -> Optional[bytes]:
+    """Convert a JSON list stored by older releases in ``users.face_embedding``."""
+    if not text:
+        return None
+    return encode_embedding(json.loads(text))
+
+
+def pairwise_distances(faces, known: np.ndarray) -> np.ndarray:
+    """Euclidean distance matrix of shape (faces, known)."""
+    faces = np.asarray(faces, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+    # ||a - b||^2 = ||a||^2 - 2ab + ||b||^2, computed in one matrix product
+    squared = (
+        np.einsum("ij,ij->i", faces, faces)[:, None]
+        - 2.0 * faces @ known.T
+        + np.einsum("ij,ij->i", known, known)[None, :]
+    )
+    return np.sqrt(np.maximum(squared, 0.0))
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.config import DetectionProfile, get_settings
+from app.utils.embeddings import EMBEDDING_DIM, EMBEDDING_DTYPE, EMBEDDING_VERSION, encode_embedding
+from app.utils.tracking import Box
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+CachedFaces = Tuple[List[Box], List[np.ndarray]]
+
+
+def profile_key(profile: DetectionProfile) -> str:
+    """Fingerprint of everything besides the image that shapes the encodings."""
+    parts = {
+        "profile": profile.model_dump(),
+        "embedding_version": EMBEDDING_VERSION,
+        "image_max_dimension": settings.image_max_dimension,
+        "image_max_pixels": settings.image_max_pixels,
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class EncodingCache:
+    """Face locations and encodings keyed by image digest and detection profile.
+
+    Stored in a standalone SQLite file so it survives restarts and is shared
+    by every worker process. Entries are evicted least-recently-used first
+    once the stored payload exceeds ``max_bytes``. The running payload total
+    lives in a one-row ``cache_stats`` table kept exact by triggers, so a
+    ``put`` reads it instead of summing the whole table.
+    """
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS encodings ("
+                " key TEXT PRIMARY KEY,"
+                " locations TEXT NOT NULL,"
+                " encodings BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_encodings_last_used ON encodings (last_used)")
+            self._create_stats(conn)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _create_stats(conn: sqlite3.Connection) -> None:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_stats ("
+                " id INTEGER PRIMARY KEY CHECK (id = 1),"
+                " total_bytes INTEGER NOT NULL)"
+            )
+            # Seeded once, for caches created before the stats table existed.
+            conn.execute(
+                "INSERT INTO cache_stats (id, total_bytes)"
+                " SELECT 1, COALESCE(SUM(size), 0) FROM encodings"
+                " WHERE NOT EXISTS (SELECT 1 FROM cache_stats)"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS encodings_insert AFTER INSERT ON encodings BEGIN"
+                " UPDATE cache_stats SET total_bytes = total_bytes + new.size; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS encodings_update AFTER UPDATE OF size ON encodings BEGIN"
+                " UPDATE cache_stats SET total_bytes = total_bytes + new.size - old.size; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS encodings_delete AFTER DELETE ON encodings BEGIN"
+                " UPDATE cache_stats SET total_bytes = total_bytes - old.size; END"
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, digest: str, profile: DetectionProfile) -> Optional[CachedFaces]:
+        key = f"{digest}:{profile_key(profile)}"
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT locations, encodings FROM encodings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE encodings SET last_used = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error:
+            logger.warning("Encoding cache lookup failed", exc_info=True)
+            return None
+        locations = [tuple(box) for box in json.loads(row[0])]
+        encodings = list(np.frombuffer(row[1], dtype=EMBEDDING_DTYPE).reshape(-1, EMBEDDING_DIM))
+        return locations, encodings
+
+    def put(self, digest: str, profile: DetectionProfile, faces: CachedFaces) -> None:
+        locations, encodings = faces
+        key = f"{digest}:{profile_key(profile)}"
+        blob = b"".join(encode_embedding(encoding) for encoding in encodings)
+        payload = json.dumps([[int(value) for value in box] for box in locations])
+        size = len(blob) + len(payload) + len(key)
+        try:
+            with self._lock:
+                conn = self._connect()
+                # An upsert rather than INSERT OR REPLACE: the implicit delete
+                # of a REPLACE does not fire the stats trigger.
+                conn.execute(
+                    "INSERT INTO encodings (key, locations, encodings, size, last_used)"
+                    " VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT (key) DO UPDATE SET locations = excluded.locations,"
+                    " encodings = excluded.encodings, size = excluded.size,"
+                    " last_used = excluded.last_used",
+                    (key, payload, blob, size, time.time()),
+                )
+                self._evict(conn)
+        except sqlite3.Error:
+            # A full or locked cache must never fail the request it is serving.
+            logger.warning("Encoding cache write failed", exc_info=True)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT total_bytes FROM cache_stats WHERE id = 1").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop the oldest entries until the cache is back under budget.
+        excess = total - self.max_bytes
+        conn.execute(
+            "DELETE FROM encodings WHERE key IN ("
+            " SELECT key FROM ("
+            "  SELECT key, size, SUM(size) OVER (ORDER BY last_used, key) AS running FROM encodings"
+            " ) WHERE running - size < ?)",
+            (excess,),
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM encodings")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+encoding_cache: Optional[EncodingCache] = (
+    EncodingCache(settings.encoding_cache_path, settings.encoding_cache_max_bytes)
+    if settings.encoding_cache_path
+    else None
+)
@@ -1,42 +1,167 @@
-import json
-import os
-from pathlib import Path
-from typing import List, Optional
+import hashlib
+import time
+from typing import List, Optional, Sequence
 
 import face_recognition
+import numpy as np
 from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image, UnidentifiedImageError
 
-from app.config import get_settings
+from app.config import DetectionProfile, get_settings
+from app.utils.embeddings import (
+    EMBEDDING_DTYPE,
+    decode_embeddings,
+    encode_embedding,
+    pairwise_distances,
+)
+from app.utils.imaging import ImageRejected, decode_image
+from app.utils.inference import inference_engine
+from app.utils.encoding_cache import encoding_cache
+from app.utils.metrics import FACE_ENCODING_CACHE, record_stages, stage, timed_job
+from app.utils.storage import stage_upload
+from app.utils.tracking import Box, overlaps_any
 
 settings = get_settings()
 
 
-def ensure_upload_dir() -> Path:
-    upload_dir = Path(settings.upload_dir)
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    return upload_dir
+def get_profile(name: Optional[str], default: str) -> DetectionProfile:
+    profile = settings.detection_profiles.get(name or default)
+    if profile is None:
+        raise HTTPException(status_code=400, detail=f"Unknown detection profile: {name}")
+    return profile
 
 
-def extract_face_embedding(file: UploadFile) -> tuple[str, str]:
-    upload_dir = ensure_upload_dir()
-    file_path = upload_dir / file.filename
-    with open(file_path, "wb") as buffer:
-        buffer.write(file.file.read())
+def locate_faces(image: np.ndarray, profile: DetectionProfile) -> List[tuple]:
+    """Detect faces on a downscaled copy and map the boxes back to ``image``."""
+    height, width = image.shape[:2]
+    scale = 1.0
+    detection_image = image
+    if profile.max_dimension and max(height, width) > profile.max_dimension:
+        scale = profile.max_dimension / max(height, width)
+        detection_image = np.asarray(
+            Image.fromarray(image).resize(
+                (round(width * scale), round(height * scale)), Image.BILINEAR
+            )
+        )
+    with stage("detect"):
+        locations = face_recognition.face_locations(
+            detection_image,
+            number_of_times_to_upsample=profile.upsample,
+            model=profile.model,
+        )
+    if scale == 1.0:
+        return locations
+    return [
+        (
+            max(0, int(top / scale)),
+            min(width, int(right / scale)),
+            min(height, int(bottom / scale)),
+            max(0, int(left / scale)),
+        )
+        for top, right, bottom, left in locations
+    ]
 
-    image = face_recognition.load_image_file(str(file_path))
-    encodings = face_recognition.face_encodings(image)
+
+def encode_faces(
+    image_bytes: bytes, profile: DetectionProfile
+) -> tuple[List[Box], List[np.ndarray]]:
+    """Detect and encode every face in an image. Runs in an inference worker."""
+    with stage("decode"):
+        image = decode_image(image_bytes)
+    locations = locate_faces(image, profile)
+    if not locations:
+        return [], []
+    # Only the detected regions are aligned and encoded, at full resolution.
+    with stage("encode"):
+        encodings = face_recognition.face_encodings(
+            image, known_face_locations=locations, num_jitters=profile.num_jitters
+        )
+    return locations, [np.asarray(encoding, dtype=EMBEDDING_DTYPE) for encoding in encodings]
+
+
+def analyze_frame(
+    image_bytes: bytes,
+    profile: DetectionProfile,
+    settled_boxes: Sequence[Box],
+    iou_threshold: float,
+) -> tuple[List[Box], List[Optional[np.ndarray]]]:
+    """Detect faces and encode only those not covered by ``settled_boxes``.
+
+    Runs in an inference worker; the returned encodings are aligned with the
+    locations, with ``None`` for faces that were skipped.
+    """
+    with stage("decode"):
+        image = decode_image(image_bytes)
+    locations = locate_faces(image, profile)
+    pending = [
+        idx for idx, location in enumerate(locations)
+        if not overlaps_any(location, settled_boxes, iou_threshold)
+    ]
+    encodings: List[Optional[np.ndarray]] = [None] * len(locations)
+    if pending:
+        with stage("encode"):
+            computed = face_recognition.face_encodings(
+                image,
+                known_face_locations=[locations[idx] for idx in pending],
+                num_jitters=profile.num_jitters,
+            )
+        for idx, encoding in zip(pending, computed):
+            encodings[idx] = np.asarray(encoding, dtype=EMBEDDING_DTYPE)
+    return locations, encodings
+
+
+async def run_face_job(fn, *args, wait: bool = False):
+    started = time.perf_counter()
+    try:
+        result, timings = await inference_engine.submit(timed_job, fn, *args, wait=wait)
+    except ImageRejected as exc:
+        raise HTTPException(status_code=413, detail=str(exc))
+    except UnidentifiedImageError:
+        raise HTTPException(status_code=400, detail="Unsupported or corrupt image")
+    # Whatever the worker didn't account for was spent queued or in transit.
+    timings["queue"] = max(0.0, time.perf_counter() - started - sum(timings.values()))
+    record_stages(timings)
+    return result
+
+
+async def encode_upload(
+    image_bytes: bytes, profile: DetectionProfile, digest: Optional[str] = None
+) -> List[np.ndarray]:
+    """Encode every face in an upload, reusing the cached result for a repeated image."""
+    if encoding_cache is None:
+        return (await run_face_job(encode_faces, image_bytes, profile))[1]
+    digest = digest or hashlib.sha256(image_bytes).hexdigest()
+    cached = await run_in_threadpool(encoding_cache.get, digest, profile)
+    if cached is not None:
+        FACE_ENCODING_CACHE.inc(result="hit")
+        return cached[1]
+    FACE_ENCODING_CACHE.inc(result="miss")
+    faces = await run_face_job(encode_faces, image_bytes, profile)
+    await run_in_threadpool(encoding_cache.put, digest, profile, faces)
+    return faces[1]
+
+
+async def extract_face_embedding(
+    file: UploadFile, profile: Optional[str] = None
+) -> tuple[str, bytes]:
+    detection_profile = get_profile(profile, settings.enrollment_profile)
+    upload = await stage_upload(file)
+    try:
+        encodings = await encode_upload(upload.data, detection_profile, upload.digest)
+    except BaseException:
+        upload.discard()
+        raise
     if not encodings:
-        os.remove(file_path)
+        upload.discard()
         raise HTTPException(status_code=400, detail="No face detected")
-    embedding = encodings[0]
-    return str(file_path), json.dumps(embedding.tolist())
+    photo_path = await run_in_threadpool(upload.commit)
+    return str(photo_path), encode_embedding(encodings[0])
 
 
-def match_embedding(known_embeddings: List[str], frame_embedding: List[float], tolerance: float = 0.6) -> Optional[int]:
-    known_vectors = [json.loads(item) for item in known_embeddings]
-    matches = face_recognition.compare_faces(known_vectors, frame_embedding, tolerance=tolerance)
-    for idx, matched in enumerate(matches):
-        if matched:
-            return idx
-    return None
+def match_embedding(known_embeddings: Sequence[bytes], frame_embedding: np.ndarray, tolerance: float = 0.6) -> Optional[int]:
+    known_vectors = decode_embeddings(known_embeddings)
+    distances = pairwise_distances(frame_embedding, known_vectors)[0]
+    matched = np.flatnonzero(distances <= tolerance)
+    return int(matched[0]) if matched.size else None
 
@@ -0,0 +1,321 @@
+import hashlib
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import FaceTemplate, StudentCourse, User
+from app.utils.embeddings import (
+    EMBEDDING_DIM,
+    EMBEDDING_VERSION,
+    decode_embedding,
+    decode_embeddings,
+    pairwise_distances,
+)
+from app.utils.shared_store import EmbeddingStore, embedding_store
+
+
+@dataclass(frozen=True)
+class CourseGallery:
+    """Enrolled embeddings of one course, row-aligned with ``student_ids``."""
+
+    course_id: int
+    student_ids: np.ndarray
+    student_names: tuple
+    embeddings: np.ndarray
+    roster: FrozenSet[int]
+    # Embedding store generation the vectors were read at, if store-backed.
+    generation: Optional[int] = None
+    # Templates of students enrolled with several photos, grouped by student;
+    # ``template_owner`` indexes ``student_ids``. ``embeddings`` holds centroids.
+    templates: np.ndarray = field(
+        default_factory=lambda: np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+    )
+    template_owner: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.student_ids)
+
+    def distances(self, frame_encodings, shortlist_radius: Optional[float] = None) -> np.ndarray:
+        """Euclidean distance matrix of shape (faces, students).
+
+        Students with several templates are scored by their closest one. Only
+        those whose centroid lies within ``shortlist_radius`` of some face are
+        expanded, in one batched product over all their templates; the rest
+        keep their centroid distance.
+        """
+        distances = pairwise_distances(frame_encodings, self.embeddings)
+        if not len(self.templates) or not distances.size:
+            return distances
+        shortlisted = np.ones(len(self.template_owner), dtype=bool)
+        if shortlist_radius is not None:
+            shortlisted = (distances.min(axis=0) <= shortlist_radius)[self.template_owner]
+        if not shortlisted.any():
+            return distances
+        owners = self.template_owner[shortlisted]
+        template_distances = pairwise_distances(frame_encodings, self.templates[shortlisted])
+        starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+        distances[:, owners[starts]] = np.minimum.reduceat(template_distances, starts, axis=1)
+        return distances
+
+
+def assign_faces(distances: np.ndarray, tolerance: float) -> List[Tuple[int, int, float]]:
+    """One-to-one ``(face, student, distance)`` matches from a (faces, students) matrix.
+
+    Pairs within ``tolerance`` are taken closest first, skipping any whose face
+    or student is already matched, so a face marks at most one student and two
+    faces never claim the same one.
+    """
+    faces, students = np.nonzero(distances <= tolerance)
+    if not len(faces):
+        return []
+    order = np.argsort(distances[faces, students], kind="stable")
+    used_faces: set = set()
+    used_students: set = set()
+    matches = []
+    for face, student in zip(faces[order].tolist(), students[order].tolist()):
+        if face in used_faces or student in used_students:
+            continue
+        used_faces.add(face)
+        used_students.add(student)
+        matches.append((face, student, float(distances[face, student])))
+    return matches
+
+
+def load_templates(course_id: int, student_ids: np.ndarray, db: Session) -> Tuple[np.ndarray, np.ndarray]:
+    """``(template_owner, templates)`` for students of the course with several templates.
+
+    A student with a single template is matched on the centroid, which equals it.
+    """
+    rows = (
+        db.query(FaceTemplate.student_id, FaceTemplate.embedding)
+        .join(StudentCourse, StudentCourse.student_id == FaceTemplate.student_id)
+        .filter(
+            StudentCourse.course_id == course_id,
+            FaceTemplate.embedding_version == EMBEDDING_VERSION,
+        )
+        .order_by(FaceTemplate.student_id, FaceTemplate.id)
+        .all()
+    )
+    position = {student_id: idx for idx, student_id in enumerate(student_ids.tolist())}
+    counts: Dict[int, int] = {}
+    for row in rows:
+        counts[row.student_id] = counts.get(row.student_id, 0) + 1
+    rows = [row for row in rows if counts[row.student_id] > 1 and row.student_id in position]
+    owners = np.fromiter((position[row.student_id] for row in rows), dtype=np.int64, count=len(rows))
+    return owners, decode_embeddings([row.embedding for row in rows])
+
+
+def load_course_gallery(course_id: int, db: Session) -> CourseGallery:
+    rows = (
+        db.query(User.id, User.name, User.face_encoding, User.embedding_version)
+        .join(StudentCourse, StudentCourse.student_id == User.id)
+        .filter(StudentCourse.course_id == course_id)
+        .all()
+    )
+    enrolled = [
+        row for row in rows
+        if row.face_encoding and row.embedding_version == EMBEDDING_VERSION
+    ]
+    student_ids = np.fromiter((row.id for row in enrolled), dtype=np.int64, count=len(enrolled))
+    template_owner, templates = load_templates(course_id, student_ids, db)
+    return CourseGallery(
+        course_id=course_id,
+        student_ids=student_ids,
+        student_names=tuple(row.name for row in enrolled),
+        embeddings=decode_embeddings([row.face_encoding for row in enrolled]),
+        roster=frozenset(row.id for row in rows),
+        templates=templates,
+        template_owner=template_owner,
+    )
+
+
+def load_roster(course_id: int, db: Session) -> List[tuple]:
+    return (
+        db.query(User.id, User.name)
+        .join(StudentCourse, StudentCourse.student_id == User.id)
+        .filter(StudentCourse.course_id == course_id)
+        .all()
+    )
+
+
+def gallery_from_store(
+    course_id: int, roster: List[tuple], store: EmbeddingStore, db: Session
+) -> CourseGallery:
+    """Centroids come from the store; templates, which it doesn't hold, from the database."""
+    student_ids = np.fromiter((row.id for row in roster), dtype=np.int64, count=len(roster))
+    generation, found, embeddings = store.gather(student_ids)
+    template_owner, templates = load_templates(course_id, student_ids[found], db)
+    return CourseGallery(
+        course_id=course_id,
+        student_ids=student_ids[found],
+        student_names=tuple(roster[idx].name for idx in found),
+        embeddings=embeddings,
+        roster=frozenset(student_ids.tolist()),
+        generation=generation,
+        templates=templates,
+        template_owner=template_owner,
+    )
+
+
+def embedding_fingerprint_query():
+    """Changes whenever an embedding is added, replaced or removed."""
+    return select(
+        func.count(User.id), func.max(User.id), func.max(User.embedding_updated_at)
+    ).where(User.face_encoding.isnot(None), User.embedding_version == EMBEDDING_VERSION)
+
+
+def fingerprint(row) -> int:
+    digest = hashlib.sha256("|".join(str(value) for value in row).encode()).digest()
+    # 0 is reserved for "unknown".
+    return int.from_bytes(digest[:8], "little") or 1
+
+
+def rebuild_embedding_store(db: Session, store: EmbeddingStore) -> int:
+    """Load every current enrolled embedding from ``users`` into ``store``."""
+    # Taken before reading so a concurrent enrollment can only make the
+    # snapshot look stale, never current.
+    expected = fingerprint(db.execute(embedding_fingerprint_query()).one())
+    rows = (
+        db.query(User.id, User.face_encoding)
+        .filter(User.face_encoding.isnot(None), User.embedding_version == EMBEDDING_VERSION)
+        .all()
+    )
+    store.rebuild(
+        np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows)),
+        decode_embeddings([row.face_encoding for row in rows]),
+        expected,
+    )
+    return len(rows)
+
+
+def sync_embedding_store(db: Session, store: EmbeddingStore) -> Optional[int]:
+    """Reuse ``store`` as written by a previous run if it still matches ``users``.
+
+    Returns the number of embeddings loaded, or None when the snapshot was
+    current and nothing had to be read.
+    """
+    if store.fingerprint == fingerprint(db.execute(embedding_fingerprint_query()).one()):
+        return None
+    return rebuild_embedding_store(db, store)
+
+
+class GalleryCache:
+    """Process-local cache of per-course galleries.
+
+    Routers that change a roster must call one of the ``invalidate_*`` methods
+    after committing, and report new or removed embeddings through
+    ``update_embeddings`` / ``forget_student``. With an embedding store, rosters
+    are cached here while the vectors come from the store, so embedding
+    changes made by any worker are picked up without querying ``users``;
+    invalidations bump the store's roster generation, which makes every
+    worker reload its rosters. Without a store, other workers' changes are
+    only seen once a cached gallery is ``ttl_seconds`` old.
+    """
+
+    def __init__(self, store: Optional[EmbeddingStore] = None, ttl_seconds: float = 10.0) -> None:
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self._galleries: Dict[int, CourseGallery] = {}
+        self._loaded_at: Dict[int, float] = {}
+        self._rosters: Dict[int, List[tuple]] = {}
+        self._generation = 0
+        self._roster_generation: Optional[int] = None
+        # Embedding updates published by this process, for caches without a store.
+        self.embedding_changes = 0
+        self._lock = threading.Lock()
+
+    def get(self, course_id: int, db: Session) -> CourseGallery:
+        if self.store is not None:
+            roster_generation = self.store.roster_generation
+            if roster_generation != self._roster_generation:
+                # Another worker changed an enrollment; which course is unknown.
+                self._drop_all()
+                self._roster_generation = roster_generation
+        gallery = self._galleries.get(course_id)
+        if gallery is not None:
+            if self.store is not None:
+                if gallery.generation != self.store.generation:
+                    gallery = None
+            elif time.monotonic() - self._loaded_at[course_id] > self.ttl_seconds:
+                gallery = None
+        if gallery is None:
+            generation = self._generation
+            if self.store is None:
+                roster = None
+                gallery = load_course_gallery(course_id, db)
+            else:
+                roster = self._rosters.get(course_id) or load_roster(course_id, db)
+                gallery = gallery_from_store(course_id, roster, self.store, db)
+            with self._lock:
+                # Don't cache a roster that was invalidated while it was loading.
+                if generation == self._generation:
+                    self._galleries[course_id] = gallery
+                    self._loaded_at[course_id] = time.monotonic()
+                    if roster is not None:
+                        self._rosters[course_id] = roster
+        return gallery
+
+    def update_embeddings(self, embeddings: Dict[int, bytes], fingerprint: int = 0) -> None:
+        """Publish newly committed embeddings, keyed by student id.
+
+        ``fingerprint`` is the database fingerprint after the commit, which
+        lets the next startup reuse the store as is.
+        """
+        self.embedding_changes += 1
+        if self.store is not None:
+            self.store.put_many(
+                ((student_id, decode_embedding(blob)) for student_id, blob in embeddings.items()),
+                fingerprint,
+            )
+            return
+        for student_id in embeddings:
+            self.invalidate_student(student_id)
+
+    def forget_student(self, student_id: int, fingerprint: int = 0) -> None:
+        self.embedding_changes += 1
+        if self.store is not None:
+            self.store.remove(student_id, fingerprint)
+        self.invalidate_student(student_id)
+
+    def invalidate_course(self, course_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            self._galleries.pop(course_id, None)
+            self._rosters.pop(course_id, None)
+        self._publish_roster_change()
+
+    def invalidate_student(self, student_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            stale = [
+                course_id
+                for course_id, gallery in self._galleries.items()
+                if student_id in gallery.roster
+            ]
+            for course_id in stale:
+                del self._galleries[course_id]
+                self._rosters.pop(course_id, None)
+        self._publish_roster_change()
+
+    def clear(self) -> None:
+        self._drop_all()
+        self._publish_roster_change()
+
+    def _drop_all(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._galleries.clear()
+            self._rosters.clear()
+
+    def _publish_roster_change(self) -> None:
+        if self.store is not None:
+            self.store.bump_roster_generation()
+
+
+gallery_cache = GalleryCache(embedding_store, get_settings().gallery_cache_ttl_seconds)
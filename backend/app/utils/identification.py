@@ -0,0 +1,81 @@
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import User
+from app.utils.ann import MIN_TRAIN_SIZE, IVFPQIndex
+from app.utils.embeddings import EMBEDDING_VERSION, decode_embeddings
+from app.utils.gallery import GalleryCache, gallery_cache
+from app.utils.metrics import GALLERY_SIZE, stage
+
+settings = get_settings()
+
+
+class IdentityIndex:
+    """One IVF-PQ index over every enrolled student, for campus-wide identification.
+
+    Built on first use and kept current incrementally: when the embedding
+    store's generation moves (or, without a store, after this process
+    publishes an embedding change) only the changed students are re-added.
+    The quantizers are retrained once the population has doubled.
+
+    Syncing mutates the index arrays in place, so searches run under the same
+    lock as updates.
+    """
+
+    def __init__(self, cache: GalleryCache) -> None:
+        self.cache = cache
+        self._index: Optional[IVFPQIndex] = None
+        self._source_generation: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _source(self) -> int:
+        if self.cache.store is not None:
+            return self.cache.store.generation
+        return self.cache.embedding_changes
+
+    def _load(self, db: Session) -> Tuple[np.ndarray, np.ndarray]:
+        if self.cache.store is not None:
+            _, student_ids, matrix = self.cache.store.snapshot()
+            return student_ids, matrix
+        rows = (
+            db.query(User.id, User.face_encoding)
+            .filter(User.face_encoding.isnot(None), User.embedding_version == EMBEDDING_VERSION)
+            .all()
+        )
+        return (
+            np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows)),
+            decode_embeddings([row.face_encoding for row in rows]),
+        )
+
+    def search(self, db: Session, queries: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """``IVFPQIndex.search`` on the up-to-date index. Blocking; the first call builds it."""
+        with self._lock:
+            index = self._current(db)
+            GALLERY_SIZE.observe(len(index))
+            with stage("match"):
+                return index.search(queries, k)
+
+    def _current(self, db: Session) -> IVFPQIndex:
+        source = self._source()
+        if self._index is not None and source == self._source_generation:
+            return self._index
+        student_ids, matrix = self._load(db)
+        index = self._index
+        retrain = index is None or (
+            len(student_ids) >= MIN_TRAIN_SIZE and len(student_ids) > 2 * index.trained_size
+        )
+        if retrain:
+            index = IVFPQIndex(nprobe=settings.identify_nprobe, rerank=settings.identify_rerank)
+            index.add(student_ids, matrix)
+            index.train(matrix)
+        else:
+            index.sync(student_ids, matrix)
+        self._index, self._source_generation = index, source
+        return index
+
+
+identity_index = IdentityIndex(gallery_cache)
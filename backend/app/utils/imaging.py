@@ -0,0 +1,49 @@
+import io
+import math
+from typing import Optional
+
+import numpy as np
+from fastapi import HTTPException, UploadFile
+from PIL import Image, ImageOps
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class ImageRejected(ValueError):
+    """Raised when an image exceeds the configured size limits."""
+
+
+async def read_upload(file: UploadFile) -> bytes:
+    """Read an upload's encoded bytes, refusing bodies above ``max_upload_bytes``."""
+    data = await file.read(settings.max_upload_bytes + 1)
+    if len(data) > settings.max_upload_bytes:
+        raise HTTPException(status_code=413, detail="Image file too large")
+    return data
+
+
+def decode_image(image_bytes: bytes, max_dimension: Optional[int] = None) -> np.ndarray:
+    """Decode to an upright RGB array within the configured pixel budget.
+
+    JPEGs are decoded with DCT scaling (``Image.draft``) so a 48 MP frame never
+    materializes at full resolution; other formats are reduced after decoding.
+    """
+    max_dimension = max_dimension or settings.image_max_dimension
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        width, height = image.size
+        if width * height > settings.image_max_source_pixels:
+            raise ImageRejected(f"Image resolution {width}x{height} is too large")
+
+        scale = min(
+            1.0,
+            max_dimension / max(width, height),
+            math.sqrt(settings.image_max_pixels / (width * height)),
+        )
+        if scale < 1.0:
+            target = (max(1, int(width * scale)), max(1, int(height * scale)))
+            image.draft("RGB", target)
+            if image.size != target:
+                image = image.resize(target, Image.BILINEAR, reducing_gap=2.0)
+        image = ImageOps.exif_transpose(image)
+        return np.asarray(image.convert("RGB"))
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def _init_worker() -> None:
+    # Importing face_recognition loads the dlib detector, landmark and encoder
+    # models; doing it here pays that cost once per worker instead of per task.
+    import face_recognition  # noqa: F401
+
+
+class InferenceEngine:
+    """Runs CPU-bound face work in a pool of worker processes.
+
+    At most ``workers + queue_size`` jobs are accepted at a time, bounded by a
+    semaphore; callers past that limit get a 503 instead of queueing without
+    bound.
+    """
+
+    def __init__(self, workers: int, queue_size: int) -> None:
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def start(self) -> None:
+        if self._executor is None:
+            logger.info("Starting %s face inference workers", self.workers)
+            # Workers start after the server's threads, locks and sqlite/mmap
+            # handles exist; forking would copy those into the children.
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                mp_context=multiprocessing.get_context(method),
+            )
+            # Created here so it belongs to the event loop serving requests.
+            self._slots = asyncio.Semaphore(self.capacity)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def submit(self, fn: Callable[..., Any], *args: Any, wait: bool = False) -> Any:
+        """Run ``fn(*args)`` in a worker; ``fn`` and its arguments must be picklable.
+
+        When the engine is saturated, interactive callers get a 503 while
+        ``wait=True`` callers (batch jobs) wait for a free slot.
+        """
+        self.start()
+        slots = self._slots
+        if not wait and slots.locked():
+            raise HTTPException(status_code=503, detail="Face recognition is busy, try again")
+        async with slots:
+            self._pending += 1
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+            finally:
+                self._pending -= 1
+
+
+inference_engine = InferenceEngine(settings.inference_workers, settings.inference_queue_size)
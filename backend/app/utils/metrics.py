@@ -0,0 +1,254 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [
+        '{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram; ``observe`` is a bisect and three additions."""
+
+    def __init__(
+        self, name: str, description: str, buckets: Sequence[float], labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.help = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (+Inf last), sum, count].
+        self._series: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauge:
+    """A value read from ``collect`` at scrape time."""
+
+    def __init__(self, name: str, description: str, collect: Callable[[], float]) -> None:
+        self.name = name
+        self.help = description
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format_value(self.collect())}",
+        ]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    LATENCY_BUCKETS,
+    ("method", "route", "status"),
+))
+REQUEST_QUERIES = registry.register(Histogram(
+    "http_request_db_queries",
+    "SQL statements executed per HTTP request.",
+    (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+    ("route",),
+))
+FACE_STAGE_DURATION = registry.register(Histogram(
+    "face_stage_duration_seconds",
+    "Time spent in each face pipeline stage.",
+    (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ("stage",),
+))
+FACES_PER_FRAME = registry.register(Histogram(
+    "face_faces_per_frame",
+    "Faces detected per marked image or streamed frame.",
+    (0, 1, 2, 4, 8, 16, 32, 64, 128),
+    ("source",),
+))
+GALLERY_SIZE = registry.register(Histogram(
+    "face_gallery_size",
+    "Enrolled embeddings searched per match.",
+    (10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000),
+))
+FACE_MATCHES = registry.register(Counter(
+    "face_matches_total",
+    "Students recognized, by source.",
+    ("source",),
+))
+FACE_ENCODING_CACHE = registry.register(Counter(
+    "face_encoding_cache_total",
+    "Encoding cache lookups, by result.",
+    ("result",),
+))
+
+# Set per request by MetricsMiddleware; a one-element list so statements run
+# in child tasks and greenlets still count toward the request.
+_query_counter: ContextVar[Optional[List[int]]] = ContextVar("query_counter", default=None)
+# Stage timings of the job running in this inference worker, if any.
+_job_stages: Optional[Dict[str, float]] = None
+
+
+@contextmanager
+def stage(name: str):
+    """Time a face pipeline stage.
+
+    Inside an inference worker the timing is returned with the job's result
+    (see ``timed_job``); elsewhere it is recorded directly.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if _job_stages is not None:
+            _job_stages[name] = _job_stages.get(name, 0.0) + elapsed
+        else:
+            FACE_STAGE_DURATION.observe(elapsed, stage=name)
+
+
+def timed_job(fn, *args):
+    """Worker entry point: run ``fn(*args)`` and return ``(result, stage timings)``."""
+    global _job_stages
+    _job_stages = {}
+    try:
+        return fn(*args), _job_stages
+    finally:
+        _job_stages = None
+
+
+def record_stages(timings: Dict[str, float]) -> None:
+    for name, elapsed in timings.items():
+        FACE_STAGE_DURATION.observe(elapsed, stage=name)
+
+
+def count_query(*_) -> None:
+    """``before_cursor_execute`` listener counting statements for the current request."""
+    counter = _query_counter.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+class MetricsMiddleware:
+    """Records latency and SQL statement counts for every HTTP request.
+
+    Requests are labelled with the matched route template (``/sessions/{session_id}``)
+    so label cardinality stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+        counter = [0]
+        token = _query_counter.set(counter)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _query_counter.reset(token)
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            REQUEST_DURATION.observe(
+                elapsed, method=scope["method"], route=template, status=str(status[0])
+            )
+            REQUEST_QUERIES.observe(counter[0], route=template)
@@ -1,23 +1,55 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 
+from fastapi import HTTPException
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.config import get_settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 settings = get_settings()
+# Hashes with a different cost are still accepted but flagged for rehashing.
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds
+)
+# bcrypt releases the GIL, so threads give real parallelism; a dedicated pool
+# keeps login bursts from starving the request threadpool.
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers, thread_name_prefix="bcrypt"
+)
+# Bounds running plus queued hashes; acquired without waiting, so it never
+# binds to an event loop.
+_password_slots = asyncio.Semaphore(
+    settings.password_hash_workers + settings.password_hash_queue_size
+)
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def _run_password_job(fn, *args):
+    """Run ``fn`` on the password executor, or 503 when its queue is full."""
+    if _password_slots.locked():
+        raise HTTPException(status_code=503, detail="Too many password checks, try again")
+    async with _password_slots:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, fn, *args)
+
+
+async def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """Verify on the password executor; also returns a new hash if the cost changed."""
+    return await _run_password_job(pwd_context.verify_and_update, plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def hash_password(password: str) -> str:
+    """``get_password_hash`` on the password executor, for async handlers."""
+    return await _run_password_job(get_password_hash, password)
+
+
 def create_access_token(data: Dict[str, Any]) -> str:
     to_encode = data.copy()
     if "sub" in to_encode:
@@ -0,0 +1,250 @@
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from app.config import get_settings
+from app.utils.embeddings import EMBEDDING_DIM, EMBEDDING_DTYPE
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+settings = get_settings()
+
+MAGIC = int.from_bytes(b"FRAEMB01", "little")
+HEADER_BYTES = 64
+# Header fields, as little-endian uint64 words.
+_MAGIC, _DIM, _CAPACITY, _COUNT, _GENERATION, _FINGERPRINT, _ROSTER_GENERATION = range(7)
+SLOT_DTYPE = np.dtype([("student_id", "<i8"), ("vector", EMBEDDING_DTYPE, (EMBEDDING_DIM,))])
+EMPTY = -1
+
+
+class EmbeddingStore:
+    """All enrolled embeddings in one memory-mapped file shared by every worker.
+
+    The file is a small header (capacity, count, generation, fingerprint)
+    followed by fixed-size slots of ``(student_id, float32[128])``. Each
+    process maps it once and reads vectors straight from the page cache;
+    writers take an exclusive ``flock`` and bump the generation, which readers
+    compare to notice updates made by other workers. A second counter, the
+    roster generation, is bumped when course enrollments or student names
+    change, so workers know to drop their cached rosters. The file only ever
+    grows, so a mapping held by another process never points past its end.
+
+    The file outlives the process, so it doubles as a startup snapshot: the
+    fingerprint records the database state it matches (see
+    ``app.utils.gallery.sync_embedding_store``).
+    """
+
+    def __init__(self, path: str, initial_capacity: int = 1024) -> None:
+        self.path = path
+        self.initial_capacity = initial_capacity
+        self._fd: Optional[int] = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._header: Optional[np.ndarray] = None
+        self._slots: Optional[np.ndarray] = None
+        self._index_generation = -1
+        self._sorted_ids = np.empty(0, dtype=np.int64)
+        self._sorted_slots = np.empty(0, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        self._ensure_open()
+        with self._lock:
+            return int(self._header[_GENERATION])
+
+    @property
+    def fingerprint(self) -> int:
+        self._ensure_open()
+        with self._lock:
+            return int(self._header[_FINGERPRINT])
+
+    @property
+    def roster_generation(self) -> int:
+        self._ensure_open()
+        with self._lock:
+            return int(self._header[_ROSTER_GENERATION])
+
+    def bump_roster_generation(self) -> None:
+        with self._locked(exclusive=True):
+            self._header[_ROSTER_GENERATION] += 1
+
+    def __len__(self) -> int:
+        with self._locked(exclusive=False):
+            self._refresh_index()
+            return len(self._sorted_ids)
+
+    def _ensure_open(self) -> None:
+        if self._fd is not None:
+            return
+        with self._lock:
+            if self._fd is not None:
+                return
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size < HEADER_BYTES:
+                    os.ftruncate(fd, HEADER_BYTES + self.initial_capacity * SLOT_DTYPE.itemsize)
+                    header = np.zeros(HEADER_BYTES // 8, dtype="<u8")
+                    header[[_MAGIC, _DIM, _CAPACITY]] = MAGIC, EMBEDDING_DIM, self.initial_capacity
+                    os.pwrite(fd, header.tobytes(), 0)
+                header = np.frombuffer(os.pread(fd, HEADER_BYTES, 0), dtype="<u8")
+                if header[_MAGIC] != MAGIC or header[_DIM] != EMBEDDING_DIM:
+                    raise RuntimeError(f"{self.path} is not an embedding store for {EMBEDDING_DIM}-d vectors")
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self._fd = fd
+            self._map()
+
+    def _map(self) -> None:
+        self._header = self._slots = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # still referenced by a view; released when that is collected
+        self._mmap = mmap.mmap(self._fd, os.fstat(self._fd).st_size)
+        self._header = np.ndarray(HEADER_BYTES // 8, dtype="<u8", buffer=self._mmap)
+        capacity = int(self._header[_CAPACITY])
+        self._slots = np.ndarray(capacity, dtype=SLOT_DTYPE, buffer=self._mmap, offset=HEADER_BYTES)
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        self._ensure_open()
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                if int(self._header[_CAPACITY]) > len(self._slots):
+                    self._map()  # grown by another worker
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _refresh_index(self) -> None:
+        generation = int(self._header[_GENERATION])
+        if generation == self._index_generation:
+            return
+        ids = np.array(self._slots["student_id"][: int(self._header[_COUNT])])
+        slots = np.flatnonzero(ids != EMPTY)
+        order = np.argsort(ids[slots], kind="stable")
+        self._sorted_ids = ids[slots][order]
+        self._sorted_slots = slots[order]
+        self._index_generation = generation
+
+    def _lookup(self, student_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions in ``student_ids`` that are stored, and their slots."""
+        if not len(self._sorted_ids) or not len(student_ids):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        positions = np.searchsorted(self._sorted_ids, student_ids)
+        positions = np.minimum(positions, len(self._sorted_ids) - 1)
+        found = np.flatnonzero(self._sorted_ids[positions] == student_ids)
+        return found, self._sorted_slots[positions[found]]
+
+    def _reserve(self, count: int) -> None:
+        capacity = int(self._header[_CAPACITY])
+        if count <= capacity:
+            return
+        capacity = max(count, capacity * 2)
+        os.ftruncate(self._fd, HEADER_BYTES + capacity * SLOT_DTYPE.itemsize)
+        self._header[_CAPACITY] = capacity
+        self._map()
+
+    def gather(self, student_ids: Iterable[int]) -> Tuple[int, np.ndarray, np.ndarray]:
+        """Return ``(generation, found, matrix)`` for ``student_ids``.
+
+        ``found`` indexes the students that have an embedding; ``matrix`` is a
+        contiguous copy of their vectors in the same order.
+        """
+        student_ids = np.asarray(list(student_ids), dtype=np.int64)
+        with self._locked(exclusive=False):
+            self._refresh_index()
+            found, slots = self._lookup(student_ids)
+            return int(self._header[_GENERATION]), found, self._slots["vector"][slots]
+
+    def snapshot(self) -> Tuple[int, np.ndarray, np.ndarray]:
+        """Return ``(generation, student_ids, matrix)`` for every stored embedding."""
+        with self._locked(exclusive=False):
+            self._refresh_index()
+            return (
+                int(self._header[_GENERATION]),
+                self._sorted_ids.copy(),
+                self._slots["vector"][self._sorted_slots],
+            )
+
+    def put_many(self, items: Iterable[Tuple[int, np.ndarray]], fingerprint: int = 0) -> None:
+        items = list(items)
+        if not items:
+            return
+        student_ids = np.fromiter((student_id for student_id, _ in items), dtype=np.int64, count=len(items))
+        with self._locked(exclusive=True):
+            self._refresh_index()
+            found, slots = self._lookup(student_ids)
+            existing = dict(zip(found.tolist(), slots.tolist()))
+            count = int(self._header[_COUNT])
+            self._reserve(count + len(items) - len(existing))
+            for position, (student_id, vector) in enumerate(items):
+                slot = existing.get(position)
+                if slot is None:
+                    slot = count
+                    count += 1
+                self._slots["vector"][slot] = vector
+                self._slots["student_id"][slot] = student_id
+            self._header[_COUNT] = count
+            self._header[_FINGERPRINT] = fingerprint
+            self._header[_GENERATION] += 1
+
+    def put(self, student_id: int, vector: np.ndarray, fingerprint: int = 0) -> None:
+        self.put_many([(student_id, vector)], fingerprint)
+
+    def remove(self, student_id: int, fingerprint: int = 0) -> None:
+        with self._locked(exclusive=True):
+            self._refresh_index()
+            _, slots = self._lookup(np.array([student_id], dtype=np.int64))
+            if len(slots):
+                self._slots["student_id"][slots] = EMPTY
+                self._header[_GENERATION] += 1
+            self._header[_FINGERPRINT] = fingerprint
+
+    def rebuild(self, student_ids: np.ndarray, matrix: np.ndarray, fingerprint: int = 0) -> None:
+        """Replace the contents with ``matrix``, row-aligned with ``student_ids``.
+
+        ``fingerprint`` identifies the database state the contents were read
+        from; 0 means unknown, so the next startup reloads from the database.
+        """
+        with self._locked(exclusive=True):
+            # Cleared first so a rebuild interrupted halfway is never trusted.
+            self._header[_FINGERPRINT] = 0
+            self._reserve(len(student_ids))
+            self._slots["vector"][: len(student_ids)] = matrix
+            self._slots["student_id"][: len(student_ids)] = student_ids
+            self._header[_COUNT] = len(student_ids)
+            self._header[_FINGERPRINT] = fingerprint
+            self._header[_GENERATION] += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is None:
+                return
+            self._header = self._slots = None
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+            os.close(self._fd)
+            self._fd = self._mmap = None
+            self._index_generation = -1
+
+
+embedding_store: Optional[EmbeddingStore] = (
+    EmbeddingStore(settings.embedding_store_path)
+    if settings.embedding_store_path and fcntl is not None
+    else None
+)
@@ -0,0 +1,105 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import get_settings
+
+settings = get_settings()
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class PhotoStore:
+    """Content-addressed photo storage under ``upload_dir``.
+
+    Files are named after the SHA-256 of their contents and sharded two levels
+    deep (``ab/cd/abcd….jpg``), so identical images are stored once and
+    uploads with the same file name never collide. Files are written to a
+    temporary name first and moved into place with an atomic rename.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = Path(root)
+
+    def path_for(self, digest: str, suffix: str = "") -> Path:
+        suffix = suffix.lower()
+        if suffix == ".jpeg":
+            suffix = ".jpg"
+        return self.root / digest[:2] / digest[2:4] / f"{digest}{suffix}"
+
+    def temp_file(self):
+        # Kept under the store root so the final rename stays on one filesystem.
+        staging = self.root / "tmp"
+        staging.mkdir(parents=True, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=staging, delete=False)
+
+    def commit(self, temp_path: Path, digest: str, suffix: str = "") -> Path:
+        target = self.path_for(digest, suffix)
+        if target.exists():
+            os.remove(temp_path)
+            return target
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, target)
+        return target
+
+    def put_bytes(self, data: bytes, suffix: str = "") -> Path:
+        digest = hashlib.sha256(data).hexdigest()
+        target = self.path_for(digest, suffix)
+        if target.exists():
+            return target
+        with self.temp_file() as temp:
+            temp.write(data)
+        return self.commit(Path(temp.name), digest, suffix)
+
+
+class StagedUpload:
+    """An upload streamed to the store's staging area but not yet committed."""
+
+    def __init__(self, store: PhotoStore, temp_path: Path, digest: str, suffix: str, data: bytes) -> None:
+        self.store = store
+        self.temp_path = temp_path
+        self.digest = digest
+        self.suffix = suffix
+        self.data = data
+
+    def commit(self) -> Path:
+        return self.store.commit(self.temp_path, self.digest, self.suffix)
+
+    def discard(self) -> None:
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+
+async def stage_upload(file: UploadFile, store: Optional[PhotoStore] = None) -> StagedUpload:
+    """Stream ``file`` to disk in chunks, hashing it and keeping the bytes for encoding.
+
+    Bodies above ``max_upload_bytes`` are refused with 413.
+    """
+    store = store or photo_store
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    temp = await run_in_threadpool(store.temp_file)
+    try:
+        while chunk := await file.read(CHUNK_SIZE):
+            buffer += chunk
+            if len(buffer) > settings.max_upload_bytes:
+                raise HTTPException(status_code=413, detail="Image file too large")
+            digest.update(chunk)
+            await run_in_threadpool(temp.write, chunk)
+        await run_in_threadpool(temp.close)
+    except BaseException:
+        temp.close()
+        os.remove(temp.name)
+        raise
+    suffix = Path(file.filename or "").suffix
+    return StagedUpload(store, Path(temp.name), digest.hexdigest(), suffix, bytes(buffer))
+
+
+photo_store = PhotoStore(settings.upload_dir)
@@ -0,0 +1,90 @@
+import itertools
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+Box = Tuple[int, int, int, int]  # (top, right, bottom, left), as face_recognition returns
+
+
+def iou(a: Box, b: Box) -> float:
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    if right <= left or bottom <= top:
+        return 0.0
+    intersection = (right - left) * (bottom - top)
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return intersection / float(area_a + area_b - intersection)
+
+
+def overlaps_any(box: Box, others: Sequence[Box], threshold: float) -> bool:
+    return any(iou(box, other) >= threshold for other in others)
+
+
+@dataclass
+class FaceTrack:
+    track_id: int
+    box: Box
+    student_id: Optional[int] = None
+    attempts: int = 0
+    misses: int = 0
+
+    @property
+    def confirmed(self) -> bool:
+        return self.student_id is not None
+
+
+class FaceTracker:
+    """Associates face boxes across frames of one stream by greedy IoU matching.
+
+    A track is confirmed once it is matched to a student; after that it no
+    longer needs encoding. Tracks that fail ``max_attempts`` matches are given
+    up on so unknown faces don't cost an encoding every frame.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_misses: int = 5, max_attempts: int = 5) -> None:
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.max_attempts = max_attempts
+        self.tracks: List[FaceTrack] = []
+        self._ids = itertools.count(1)
+
+    def settled_boxes(self) -> List[Box]:
+        """Boxes of tracks that no longer need to be encoded."""
+        return [
+            track.box
+            for track in self.tracks
+            if track.confirmed or track.attempts >= self.max_attempts
+        ]
+
+    def update(self, boxes: Sequence[Box]) -> List[FaceTrack]:
+        """Assign each box to a track, returning tracks aligned with ``boxes``."""
+        pairs = sorted(
+            (
+                (iou(track.box, box), track_idx, box_idx)
+                for track_idx, track in enumerate(self.tracks)
+                for box_idx, box in enumerate(boxes)
+            ),
+            reverse=True,
+        )
+        assigned: List[Optional[FaceTrack]] = [None] * len(boxes)
+        used_tracks = set()
+        for score, track_idx, box_idx in pairs:
+            if score < self.iou_threshold:
+                break
+            if track_idx in used_tracks or assigned[box_idx] is not None:
+                continue
+            used_tracks.add(track_idx)
+            assigned[box_idx] = self.tracks[track_idx]
+
+        for track_idx, track in enumerate(self.tracks):
+            track.misses = 0 if track_idx in used_tracks else track.misses + 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+
+        for box_idx, box in enumerate(boxes):
+            track = assigned[box_idx]
+            if track is None:
+                track = FaceTrack(track_id=next(self._ids), box=box)
+                self.tracks.append(track)
+                assigned[box_idx] = track
+            track.box = tuple(box)
+        return assigned
@@ -0,0 +1,5 @@
+-- Store face embeddings as raw little-endian float32 bytes (512 bytes for 128-d)
+-- tagged with the model that produced them. Run scripts/backfill_embeddings.py
+-- afterwards to convert existing JSON embeddings.
+ALTER TABLE users ADD COLUMN face_encoding BLOB NULL;
+ALTER TABLE users ADD COLUMN embedding_version TEXT NULL;
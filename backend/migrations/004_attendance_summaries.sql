@@ -0,0 +1,14 @@
+-- Per-(student, course) attendance counters. Populate existing data with
+-- scripts/rebuild_attendance_summary.py.
+CREATE TABLE IF NOT EXISTS attendance_summaries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id INTEGER NOT NULL REFERENCES users(id),
+    course_id INTEGER NOT NULL REFERENCES courses(id),
+    present INTEGER NOT NULL DEFAULT 0,
+    late INTEGER NOT NULL DEFAULT 0,
+    absent INTEGER NOT NULL DEFAULT 0,
+    excused INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    CONSTRAINT uq_attendance_summary UNIQUE(student_id, course_id)
+);
+CREATE INDEX IF NOT EXISTS ix_attendance_summaries_student_id ON attendance_summaries (student_id);
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from app.database import SessionLocal
+from app.models import FaceTemplate, User
+from app.utils.embeddings import EMBEDDING_VERSION, legacy_json_to_blob
+
+
+def main() -> None:
+    db = SessionLocal()
+    try:
+        users = (
+            db.query(User)
+            .filter(User.face_embedding.isnot(None), User.face_encoding.is_(None))
+            .all()
+        )
+        now = datetime.utcnow()
+        skipped = []
+        for user in users:
+            try:
+                blob = legacy_json_to_blob(user.face_embedding)
+            except ValueError:
+                skipped.append(user.id)
+                continue
+            user.face_encoding = blob
+            user.embedding_version = EMBEDDING_VERSION
+            user.embedding_updated_at = now
+            user.face_embedding = None
+            # The converted vector is the student's only template, so later
+            # uploads average with it instead of replacing it.
+            db.add(FaceTemplate(
+                student_id=user.id,
+                embedding=user.face_encoding,
+                embedding_version=EMBEDDING_VERSION,
+                photo_path=user.photo_path,
+                created_at=now,
+            ))
+        db.commit()
+        print(f"Backfilled {len(users) - len(skipped)} embeddings")
+        if skipped:
+            print(f"Skipped {len(skipped)} unreadable embeddings, user ids: {', '.join(map(str, skipped))}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Latency percentiles and query counts for the API hot paths on synthetic data.
+
+    python -m scripts.benchmark_api --students 2000 --iterations 200 --output api.json
+
+Requests go through the full ASGI app (routing, auth, validation, database)
+against a temporary SQLite database. Face detection is replaced by sampling
+enrolled embeddings, so ``mark_attendance`` measures matching and the
+database writes rather than dlib; see ``benchmark_matching`` for the former.
+"""
+import argparse
+import importlib
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from scripts.benchmarking import summarize, write_results
+
+NOISE = 0.02
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark API endpoints on synthetic data")
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--courses", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=10, help="past sessions per course")
+    parser.add_argument("--courses-per-student", type=int, default=4)
+    parser.add_argument("--faces", type=int, default=8, help="faces per marked frame")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench-"))
+    # Settings are read when the app is first imported, so point it at the
+    # scratch database before importing anything from it.
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'bench.db'}"
+    os.environ["UPLOAD_DIR"] = str(workdir / "uploads")
+    os.environ["EMBEDDING_STORE_PATH"] = str(workdir / "embeddings.bin")
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event, insert
+
+    from app.database import SessionLocal, async_engine
+    from app.main import app
+    from app.models import Session as SessionModel
+    from app.utils.gallery import gallery_cache, rebuild_embedding_store
+    from app.utils.security import create_access_token
+    from scripts.synthetic_data import generate
+
+    rng = np.random.default_rng(args.seed)
+    picker = random.Random(args.seed)
+    queries = [0]
+
+    def count_query(*_):
+        queries[0] += 1
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_query)
+
+    frame_course = [0]
+
+    async def encode_upload(_image_bytes, _profile):
+        """Embeddings of ``--faces`` enrolled students plus one stranger."""
+        members = data.enrollments[frame_course[0]]
+        chosen = picker.sample(members, min(args.faces, len(members)))
+        faces = [
+            data.embeddings[student_id] + rng.normal(0, NOISE, 128).astype(np.float32)
+            for student_id in chosen
+        ]
+        faces.append(rng.standard_normal(128).astype(np.float32))
+        return faces
+
+    # app.attendance re-exports its APIRouter as ``router``, shadowing the module.
+    importlib.import_module("app.attendance.router").encode_upload = encode_upload
+
+    with TestClient(app) as client:
+        db = SessionLocal()
+        started = time.perf_counter()
+        data = generate(
+            db,
+            students=args.students,
+            courses=args.courses,
+            sessions=args.sessions,
+            courses_per_student=args.courses_per_student,
+            seed=args.seed,
+        )
+        if gallery_cache.store is not None:
+            rebuild_embedding_store(db, gallery_cache.store)
+        print(f"Generated data in {time.perf_counter() - started:.1f}s")
+
+        def auth(user_id: int, role: str) -> Dict[str, str]:
+            return {"Authorization": f"Bearer {create_access_token({'sub': user_id, 'role': role})}"}
+
+        admin = auth(data.admin_id, "admin")
+        teachers = {course_id: auth(teacher_id, "teacher") for course_id, teacher_id in data.course_teachers.items()}
+        course_ids = list(data.course_teachers)
+
+        # Sessions for submit_session, one per call.
+        submit_sessions: List[tuple] = []
+        for _ in range(args.warmup + args.iterations):
+            course_id = picker.choice(course_ids)
+            session_id = db.scalar(
+                insert(SessionModel)
+                .values(course_id=course_id, teacher_id=data.course_teachers[course_id], status="open")
+                .returning(SessionModel.id)
+            )
+            submit_sessions.append((course_id, session_id))
+        db.commit()
+        db.close()
+
+        def mark():
+            course_id = picker.choice(course_ids)
+            frame_course[0] = course_id
+            return client.post(
+                "/attendance/mark",
+                data={"session_id": data.open_sessions[course_id]},
+                files={"file": ("frame.jpg", b"frame", "image/jpeg")},
+                headers=teachers[course_id],
+            )
+
+        def student_attendance():
+            return client.get(f"/attendance/student/{picker.choice(data.student_ids)}", headers=admin)
+
+        def session_attendance():
+            course_id = picker.choice(course_ids)
+            # Sessions are numbered per course, so this is its last submitted one.
+            session_id = data.open_sessions[course_id] - 1
+            return client.get(f"/attendance/session/{session_id}", headers=teachers[course_id])
+
+        def submit():
+            course_id, session_id = submit_sessions.pop()
+            return client.post(f"/sessions/submit?session_id={session_id}", headers=teachers[course_id])
+
+        def export_page():
+            return client.get("/attendance/all", params={"limit": 1000}, headers=admin)
+
+        endpoints: Dict[str, Callable] = {
+            "mark_attendance": mark,
+            "get_student_attendance": student_attendance,
+            "get_session_attendance": session_attendance,
+            "submit_session": submit,
+            "get_all_attendance": export_page,
+        }
+        results = {}
+        for name, call in endpoints.items():
+            timings: List[float] = []
+            query_counts: Dict[int, int] = defaultdict(int)
+            for iteration in range(args.warmup + args.iterations):
+                queries[0] = 0
+                started = time.perf_counter()
+                response = call()
+                elapsed = (time.perf_counter() - started) * 1000
+                if response.status_code != 200:
+                    raise SystemExit(f"{name} returned {response.status_code}: {response.text}")
+                if iteration >= args.warmup:
+                    timings.append(elapsed)
+                    query_counts[queries[0]] += 1
+            results[name] = {
+                **summarize(timings),
+                "queries_mean": round(sum(count * n for count, n in query_counts.items()) / len(timings), 2),
+                "queries_max": max(query_counts),
+            }
+            stats = results[name]
+            print(
+                f"{name:<24} p50 {stats['p50_ms']:>8.2f}ms  p95 {stats['p95_ms']:>8.2f}ms  "
+                f"p99 {stats['p99_ms']:>8.2f}ms  queries {stats['queries_mean']:>6.2f} (max {stats['queries_max']})"
+            )
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    write_results("api", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Micro-benchmarks for matching one face against galleries of growing size.
+
+    python -m scripts.benchmark_matching --sizes 50 1000 10000 100000 --output matching.json
+
+``match_embedding`` decodes the stored blobs on every call; ``gallery`` is the
+same search against a pre-decoded ``CourseGallery`` as the marking path uses.
+``templates`` is the gallery search when every student has ``--templates``
+enrollment photos, scored best-of-K behind the centroid prefilter.
+``ivfpq`` is one face against the institution-wide ANN index used by
+``/attendance/identify``, with its build time and recall against exact search.
+"""
+import argparse
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from app.config import get_settings
+from app.utils.ann import IVFPQIndex, recall_at_k
+from app.utils.embeddings import encode_embedding
+from app.utils.face import match_embedding
+from app.utils.gallery import CourseGallery
+from scripts.benchmarking import summarize, write_results
+from scripts.synthetic_data import random_embeddings
+
+DEFAULT_SIZES = [50, 500, 5_000, 50_000, 100_000]
+
+
+def measure(call: Callable[[], object], repeat: int) -> List[float]:
+    call()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark face matching by gallery size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--faces", type=int, default=8, help="faces per frame for the gallery search")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--templates", type=int, default=5, help="enrollment photos per student")
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--recall-queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    shortlist_radius = args.tolerance + get_settings().template_shortlist_margin
+    results = {}
+    print(
+        f"{'size':>8} {'match_embedding p50':>20} {'p95':>9} {'gallery p50':>12} {'p95':>9} "
+        f"{'templates p50':>14} {'p95':>9} {'ivfpq p50':>10} {'p95':>9} {'recall@1':>9} {'build':>7}"
+    )
+    for size in args.sizes:
+        vectors = random_embeddings(size, rng)
+        blobs = [encode_embedding(vector) for vector in vectors]
+        gallery = CourseGallery(
+            course_id=0,
+            student_ids=np.arange(size, dtype=np.int64),
+            student_names=tuple(str(index) for index in range(size)),
+            embeddings=vectors,
+            roster=frozenset(range(size)),
+        )
+        # The probe matches the last entry, so a linear scan can't stop early.
+        probe = vectors[-1] + rng.normal(0, 0.02, vectors.shape[1]).astype(np.float32)
+        frame = [probe, *random_embeddings(args.faces - 1, rng)]
+
+        single = summarize(measure(lambda: match_embedding(blobs, probe, args.tolerance), args.repeat))
+        batched = summarize(measure(lambda: gallery.distances(frame), args.repeat))
+
+        # Each student's photos scatter around their centroid like real re-enrollments.
+        templates = np.repeat(vectors, args.templates, axis=0)
+        templates += rng.normal(0, 0.05, templates.shape).astype(np.float32)
+        multi = CourseGallery(
+            course_id=0,
+            student_ids=gallery.student_ids,
+            student_names=gallery.student_names,
+            embeddings=templates.reshape(size, args.templates, -1).mean(axis=1),
+            roster=gallery.roster,
+            templates=templates,
+            template_owner=np.repeat(gallery.student_ids, args.templates),
+        )
+        best_of_k = summarize(measure(lambda: multi.distances(frame, shortlist_radius), args.repeat))
+
+        started = time.perf_counter()
+        index = IVFPQIndex(nprobe=args.nprobe)
+        index.add(gallery.student_ids, vectors)
+        index.train(vectors)
+        build_s = time.perf_counter() - started
+        ann = summarize(measure(lambda: index.search(probe), args.repeat))
+        # Noisy copies of enrolled faces, as a camera would see them.
+        queries = vectors[rng.choice(size, size=args.recall_queries)]
+        queries = queries + rng.normal(0, 0.02, queries.shape).astype(np.float32)
+        ann.update(
+            build_s=round(build_s, 3),
+            recall_at_1=recall_at_k(index, queries, 1),
+            recall_at_10=recall_at_k(index, queries, min(10, size)),
+        )
+
+        results[str(size)] = {
+            "match_embedding": single, "gallery": batched, "templates": best_of_k, "ivfpq": ann,
+        }
+        print(
+            f"{size:>8} {single['p50_ms']:>18.3f}ms {single['p95_ms']:>7.3f}ms "
+            f"{batched['p50_ms']:>10.3f}ms {batched['p95_ms']:>7.3f}ms "
+            f"{best_of_k['p50_ms']:>12.3f}ms {best_of_k['p95_ms']:>7.3f}ms "
+            f"{ann['p50_ms']:>8.3f}ms {ann['p95_ms']:>7.3f}ms {ann['recall_at_1']:>9.3f} {build_s:>6.1f}s"
+        )
+
+    write_results("matching", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+
+def measure(context: CryptContext, password_hash: str, threads: int, seconds: float) -> float:
+    """Return password verifications per second using ``threads`` threads."""
+    deadline = time.perf_counter() + seconds
+
+    def worker() -> int:
+        count = 0
+        while time.perf_counter() < deadline:
+            context.verify("correct horse battery staple", password_hash)
+            count += 1
+        return count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        total = sum(executor.map(lambda _: worker(), range(threads)))
+    return total / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure bcrypt login throughput")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12])
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    print(f"{'rounds':>6} {'ms/login':>9} {'logins/s/core':>14} {f'logins/s ({args.threads} threads)':>24}")
+    for rounds in args.rounds:
+        context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+        password_hash = context.hash("correct horse battery staple")
+        single = measure(context, password_hash, 1, args.seconds)
+        parallel = measure(context, password_hash, args.threads, args.seconds)
+        print(f"{rounds:>6} {1000 / single:>9.1f} {single:>14.1f} {parallel:>24.1f}")
+
+
+if __name__ == "__main__":
+    main()
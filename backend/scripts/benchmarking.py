@@ -0,0 +1,49 @@
+"""Helpers shared by the benchmark scripts: percentiles and JSON result files."""
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+
+def summarize(samples_ms: Iterable[float]) -> Dict[str, float]:
+    samples = np.asarray(list(samples_ms), dtype=np.float64)
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "count": int(samples.size),
+        "mean_ms": round(float(samples.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(samples.max()), 3),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(benchmark: str, params: dict, results: dict, output: Optional[str]) -> dict:
+    """Wrap ``results`` with run metadata and write them to ``output`` as JSON."""
+    payload = {
+        "benchmark": benchmark,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": params,
+        "results": results,
+    }
+    if output:
+        Path(output).write_text(json.dumps(payload, indent=2) + "\n")
+        print(f"Results written to {output}")
+    return payload
@@ -0,0 +1,60 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python -m scripts.compare_benchmarks baseline.json candidate.json --threshold 10
+
+Exits with status 1 when a p50/p95 latency grows by more than ``--threshold``
+percent or an endpoint issues more queries on average.
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Iterator, Tuple
+
+METRICS = ("p50_ms", "p95_ms", "queries_mean")
+
+
+def _stats(results: dict, prefix: str = "") -> Iterator[Tuple[str, Dict[str, float]]]:
+    for name, value in results.items():
+        if isinstance(value, dict) and "p50_ms" in value:
+            yield prefix + name, value
+        elif isinstance(value, dict):
+            yield from _stats(value, f"{prefix}{name}.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed latency growth in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    if baseline["benchmark"] != candidate["benchmark"]:
+        sys.exit(f"Cannot compare {baseline['benchmark']} results with {candidate['benchmark']} results")
+
+    before = dict(_stats(baseline["results"]))
+    regressions = 0
+    print(f"{'':<40} {'metric':<13} {'baseline':>10} {'candidate':>10} {'change':>8}")
+    for name, stats in _stats(candidate["results"]):
+        if name not in before:
+            continue
+        for metric in METRICS:
+            if metric not in stats or metric not in before[name]:
+                continue
+            old, new = before[name][metric], stats[metric]
+            change = (new - old) / old * 100 if old else 0.0
+            if metric == "queries_mean":
+                regressed = new > old
+            else:
+                regressed = change > args.threshold
+            regressions += regressed
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:<40} {metric:<13} {old:>10.3f} {new:>10.3f} {change:>+7.1f}%{flag}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+from app.attendance.summary import rebuild_summaries
+from app.database import SessionLocal
+
+
+def main() -> None:
+    db = SessionLocal()
+    try:
+        drifted = rebuild_summaries(db)
+        db.commit()
+        print(f"Attendance summaries rebuilt ({drifted} rows had drifted)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+from app.database import SessionLocal
+from app.utils.gallery import rebuild_embedding_store
+from app.utils.shared_store import embedding_store
+
+
+def main() -> None:
+    if embedding_store is None:
+        print("Embedding store is disabled (EMBEDDING_STORE_PATH is empty)")
+        return
+    db = SessionLocal()
+    try:
+        count = rebuild_embedding_store(db, embedding_store)
+        print(f"Wrote {count} embeddings to {embedding_store.path}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
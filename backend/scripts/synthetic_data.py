@@ -0,0 +1,187 @@
+"""Populate a database with synthetic students, courses, sessions and embeddings.
+
+Used by the benchmarks; can also be run on its own to build a throwaway
+SQLite database:
+
+    python -m scripts.synthetic_data --students 5000 --courses 50 --output bench.db
+"""
+import argparse
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.attendance.summary import refresh_summaries
+from app.config import Settings
+from app.database import Base, create_db_engine
+from app.models import Attendance, Course, FaceTemplate, Session as SessionModel, StudentCourse, User
+from app.utils.embeddings import EMBEDDING_DIM, EMBEDDING_VERSION, encode_embedding
+from app.utils.security import get_password_hash
+
+PASSWORD = "benchmark"
+# Weights of the statuses recorded for past sessions.
+STATUS_WEIGHTS = {"present": 0.8, "late": 0.05, "absent": 0.1, "excused": 0.05}
+
+
+@dataclass
+class SyntheticData:
+    admin_id: int
+    student_ids: List[int]
+    course_teachers: Dict[int, int]
+    enrollments: Dict[int, List[int]]
+    embeddings: Dict[int, np.ndarray]
+    open_sessions: Dict[int, int] = field(default_factory=dict)
+
+
+def random_embeddings(count: int, rng: np.random.Generator) -> np.ndarray:
+    """Unit-length vectors; random pairs sit ~1.4 apart, well past any match tolerance."""
+    vectors = rng.standard_normal((count, EMBEDDING_DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def generate(
+    db: Session,
+    students: int = 1000,
+    courses: int = 20,
+    sessions: int = 10,
+    courses_per_student: int = 4,
+    courses_per_teacher: int = 3,
+    seed: int = 0,
+) -> SyntheticData:
+    """Insert the dataset into an empty database and commit.
+
+    Each course gets ``sessions`` submitted sessions with a record for every
+    enrolled student, plus one open session to mark attendance against.
+    """
+    rng = np.random.default_rng(seed)
+    password_hash = get_password_hash(PASSWORD)
+    teachers = -(-courses // courses_per_teacher)
+
+    admin_id = 1
+    teacher_ids = list(range(2, 2 + teachers))
+    student_ids = list(range(2 + teachers, 2 + teachers + students))
+    vectors = random_embeddings(students, rng)
+    now = datetime.utcnow()
+
+    def user(user_id: int, role: str, **extra) -> dict:
+        return {
+            "id": user_id, "name": f"{role.title()} {user_id}", "email": f"{role}{user_id}@bench.local",
+            "role": role, "password_hash": password_hash, "group": None,
+            "face_encoding": None, "embedding_version": None, "embedding_updated_at": None, **extra,
+        }
+
+    users = [
+        user(admin_id, "admin"),
+        *(user(teacher_id, "teacher") for teacher_id in teacher_ids),
+        *(
+            user(student_id, "student", group=f"G{student_id % 10}",
+                 face_encoding=encode_embedding(vector), embedding_version=EMBEDDING_VERSION,
+                 embedding_updated_at=now)
+            for student_id, vector in zip(student_ids, vectors)
+        ),
+    ]
+    db.execute(insert(User), users)
+    db.execute(
+        insert(FaceTemplate),
+        [
+            {"student_id": student_id, "embedding": encode_embedding(vector),
+             "embedding_version": EMBEDDING_VERSION, "created_at": now}
+            for student_id, vector in zip(student_ids, vectors)
+        ],
+    )
+
+    course_ids = list(range(1, courses + 1))
+    course_teachers = {course_id: teacher_ids[(course_id - 1) // courses_per_teacher] for course_id in course_ids}
+    db.execute(
+        insert(Course),
+        [
+            {"id": course_id, "name": f"Course {course_id}", "description": "Synthetic course",
+             "teacher_id": teacher_id}
+            for course_id, teacher_id in course_teachers.items()
+        ],
+    )
+
+    enrollments: Dict[int, List[int]] = {course_id: [] for course_id in course_ids}
+    per_student = min(courses_per_student, courses)
+    for student_id in student_ids:
+        for course_id in rng.choice(course_ids, size=per_student, replace=False):
+            enrollments[int(course_id)].append(student_id)
+    db.execute(
+        insert(StudentCourse),
+        [
+            {"student_id": student_id, "course_id": course_id}
+            for course_id, members in enrollments.items()
+            for student_id in members
+        ],
+    )
+
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    started = datetime.utcnow() - timedelta(days=sessions + 1)
+    session_rows, attendance_rows = [], []
+    data = SyntheticData(
+        admin_id=admin_id,
+        student_ids=student_ids,
+        course_teachers=course_teachers,
+        enrollments=enrollments,
+        embeddings=dict(zip(student_ids, vectors)),
+    )
+    for course_id, teacher_id in course_teachers.items():
+        for number in range(sessions + 1):
+            session_id = len(session_rows) + 1
+            held_at = started + timedelta(days=number)
+            is_open = number == sessions
+            session_rows.append(
+                {"id": session_id, "course_id": course_id, "teacher_id": teacher_id,
+                 "started_at": held_at, "ended_at": None if is_open else held_at + timedelta(hours=1),
+                 "status": "open" if is_open else "submitted"}
+            )
+            if is_open:
+                data.open_sessions[course_id] = session_id
+                continue
+            members = enrollments[course_id]
+            for student_id, status in zip(members, rng.choice(statuses, size=len(members), p=weights)):
+                attendance_rows.append(
+                    {"session_id": session_id, "student_id": student_id, "status": str(status),
+                     "timestamp": held_at}
+                )
+    db.execute(insert(SessionModel), session_rows)
+    if attendance_rows:
+        db.execute(insert(Attendance), attendance_rows)
+    refresh_summaries(db)
+    db.commit()
+    return data
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a synthetic SQLite database")
+    parser.add_argument("--output", required=True, help="SQLite file to create")
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--courses", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=10, help="past sessions per course")
+    parser.add_argument("--courses-per-student", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    engine = create_db_engine(Settings(database_url=f"sqlite:///{args.output}"))
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        data = generate(
+            db,
+            students=args.students,
+            courses=args.courses,
+            sessions=args.sessions,
+            courses_per_student=args.courses_per_student,
+            seed=args.seed,
+        )
+    print(
+        f"Wrote {len(data.student_ids)} students, {len(data.course_teachers)} courses and "
+        f"{args.sessions + 1} sessions per course to {args.output} (password: {PASSWORD})"
+    )
+
+
+if __name__ == "__main__":
+    main()
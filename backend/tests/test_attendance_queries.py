@@ -0,0 +1,71 @@
+"""Query budget for ``GET /attendance/student/{student_id}``.
+
+The history, per-course session numbering and percentages come from a fixed
+number of set-based queries, however many sessions and courses exist.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Settings are read when the app is first imported, so point it at a scratch
+# database before importing anything from it.
+WORKDIR = Path(tempfile.mkdtemp(prefix="attendance-queries-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{WORKDIR / 'test.db'}"
+os.environ["UPLOAD_DIR"] = str(WORKDIR / "uploads")
+os.environ["ENCODING_CACHE_PATH"] = ""
+os.environ["EMBEDDING_STORE_PATH"] = ""
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.database import SessionLocal, async_engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.utils.security import create_access_token  # noqa: E402
+from scripts.synthetic_data import generate  # noqa: E402
+
+QUERY_BUDGET = 3
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    with TestClient(app) as client:
+        with SessionLocal() as db:
+            data = generate(db, students=50, courses=6, sessions=8, courses_per_student=3)
+        yield client, data
+
+
+def count_queries(call):
+    statements = []
+
+    def record(_conn, _cursor, statement, *_):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        response = call()
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    return response, statements
+
+
+@pytest.mark.parametrize("role", ["admin", "student"])
+def test_student_attendance_query_budget(seeded, role):
+    client, data = seeded
+    student_id = data.student_ids[7]
+    subject = data.admin_id if role == "admin" else student_id
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': subject, 'role': role})}"}
+    # The first request also loads the principal into the auth cache.
+    client.get(f"/attendance/student/{student_id}", headers=headers)
+
+    response, statements = count_queries(
+        lambda: client.get(f"/attendance/student/{student_id}", headers=headers)
+    )
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    enrolled = [course_id for course_id, members in data.enrollments.items() if student_id in members]
+    assert {row["course_id"] for row in body["percentages"]} == set(enrolled)
+    assert len(body["history"]) == 8 * len(enrolled)
+    assert len(statements) <= QUERY_BUDGET, "\n\n".join(statements)
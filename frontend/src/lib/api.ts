@@ -413,9 +413,17 @@ export const attendanceApi = {
   },
 
   getAll: async () => {
-    const response = await fetchWithAuth("/attendance/all");
-    if (!response.ok) throw new Error("Failed to fetch all attendance records");
-    return response.json();
+    // The endpoint is keyset-paginated; follow X-Next-Cursor until exhausted.
+    const records: any[] = [];
+    let cursor: string | null = null;
+    do {
+      const query: string = cursor ? `?cursor=${cursor}` : "";
+      const response = await fetchWithAuth(`/attendance/all${query}`);
+      if (!response.ok) throw new Error("Failed to fetch all attendance records");
+      records.push(...(await response.json()));
+      cursor = response.headers.get("X-Next-Cursor");
+    } while (cursor);
+    return records;
   },
 };
 